@@ -1,4 +1,87 @@
-from .models import Disease
+from .metrics import timed
+from .models import Medicine
+from .symptom_cache import symptom_result_cache
+from .symptom_index import aget_symptom_index, get_symptom_index
+
+TOP_K = 3
+
+
+def _recommendation(final_score):
+    if final_score <= 30:
+        return "Home Remedies"
+    elif final_score <= 60:
+        return "Ayurveda & Homeopathy"
+    return "Allopathy + Doctor Consultation"
+
+
+def _medicines_query(disease_ids):
+    """One query for the medicines of every given disease."""
+    return Medicine.objects.filter(disease_id__in=disease_ids).order_by('id').values_list('disease_id', 'type', 'name')
+
+
+def _group_medicines(rows):
+    grouped = {}
+    for disease_id, med_type, name in rows:
+        grouped.setdefault(disease_id, {}).setdefault(med_type, []).append(name)
+    return grouped
+
+
+def _top_disease_ids(index, ranked_cases):
+    """Medicines are only fetched for the diseases that made some top-k."""
+    return {index.disease_ids[pos] for positions, _ in ranked_cases for pos in positions}
+
+
+def _rank(index, name_lists, top_k):
+    """Return (top positions, their scores) per symptom list."""
+    with timed('score'):
+        return _rank_lists(index, name_lists, top_k)
+
+
+def _rank_lists(index, name_lists, top_k):
+    column_lists = [index.lookup(names) for names in name_lists]
+    if len(column_lists) == 1:
+        scores = index.scores(index.match_counts(column_lists[0]))
+        top = index.top_k(scores, top_k)
+        return [(top, scores[top])]
+
+    ranked_cases = []
+    for counts in index.batch_match_counts(column_lists):
+        for scores in index.scores(counts):
+            top = index.top_k(scores, top_k)
+            ranked_cases.append((top, scores[top]))
+    return ranked_cases
+
+
+def _build_results(index, ranked_cases, medicines):
+    """
+    ranked_cases: list of (top positions, their scores) pairs, one per symptom list.
+    medicines: {disease id: {type: [names]}}
+    """
+    all_results = []
+    for positions, top_scores in ranked_cases:
+        results = []
+        for pos, final_score in zip(positions, top_scores.tolist()):
+            disease_medicines = medicines.get(index.disease_ids[pos], {})
+            results.append({
+                'disease_name': index.names[pos],
+                'match_score': round(final_score, 2),
+                'severity': index.severities[pos],
+                'recommendation': _recommendation(final_score),
+                'specialist': index.specialists[pos],
+                'allopathic_medicines': disease_medicines.get('Allopathy', []),
+                'home_remedies': disease_medicines.get('Home', []),
+                'ayurvedic_medicines': disease_medicines.get('Ayurveda', []),
+            })
+        all_results.append(results)
+    return all_results
+
+
+def _compute(index, name_lists, top_k):
+    ranked_cases = _rank(index, name_lists, top_k)
+    disease_ids = _top_disease_ids(index, ranked_cases)
+    medicines = _group_medicines(_medicines_query(disease_ids)) if disease_ids else {}
+    return _build_results(index, ranked_cases, medicines)
+
 
 def calculate_disease_probability(user_symptoms, age, weight):
     """
@@ -6,51 +89,41 @@ def calculate_disease_probability(user_symptoms, age, weight):
     user_symptoms: list of strings (symptom names)
     return: list of dicts with disease, score, severity, recommendation
     """
-    results = []
-    diseases = Disease.objects.prefetch_related('symptoms').all()
-    
-    # Normalize user symptoms
-    user_symptoms_set = set(s.lower() for s in user_symptoms)
-    
-    for disease in diseases:
-        disease_symptoms = set(s.name.lower() for s in disease.symptoms.all())
-        if not disease_symptoms:
-            continue
-            
-        common_symptoms = user_symptoms_set.intersection(disease_symptoms)
-        match_count = len(common_symptoms)
-        
-        if match_count > 0:
-            # Simple score calculation
-            # Weights: Critical diseases get a boost if critical symptoms match (mock logic)
-            score = (match_count / len(disease_symptoms)) * 100
-            
-            # Severity handling
-            severity_map = {'Low': 0, 'Medium': 10, 'High': 20, 'Critical': 30}
-            base_severity_score = severity_map.get(disease.severity, 0)
-            
-            final_score = min(score + base_severity_score, 100)
-            
-            # Recommendation Logic
-            rec_action = ""
-            if final_score <= 30:
-                rec_action = "Home Remedies"
-            elif final_score <= 60:
-                rec_action = "Ayurveda & Homeopathy"
-            else:
-                rec_action = "Allopathy + Doctor Consultation"
-                
-            results.append({
-                'disease_name': disease.name,
-                'match_score': round(final_score, 2),
-                'severity': disease.severity,
-                'recommendation': rec_action,
-                'specialist': disease.consult_specialist,
-                'allopathic_medicines': [m.name for m in disease.medicines.filter(type='Allopathy')], # Access related medicines
-                'home_remedies': [m.name for m in disease.medicines.filter(type='Home')],
-                'ayurvedic_medicines': [m.name for m in disease.medicines.filter(type='Ayurveda')],
-            })
-            
-    # Sort by score desc
-    results.sort(key=lambda x: x['match_score'], reverse=True)
-    return results[:3] # Return top 3
+    index = get_symptom_index()
+
+    # Normalize user symptoms; unknown ones cannot change the result
+    names = index.resolve(user_symptoms)
+
+    # Score = matched / total symptoms * 100, plus a severity boost (mock logic)
+    key = symptom_result_cache.make_key(names, index.version, TOP_K)
+    return symptom_result_cache.get_or_compute(key, lambda: _compute(index, [names], TOP_K)[0])
+
+
+async def acalculate_disease_probability(user_symptoms, age, weight):
+    """Async version of calculate_disease_probability using the async ORM and cache APIs."""
+    index = await aget_symptom_index()
+    names = index.resolve(user_symptoms)
+
+    async def compute():
+        ranked_cases = _rank(index, [names], TOP_K)
+        disease_ids = _top_disease_ids(index, ranked_cases)
+        medicines = _group_medicines([row async for row in _medicines_query(disease_ids)]) if disease_ids else {}
+        return _build_results(index, ranked_cases, medicines)[0]
+
+    key = symptom_result_cache.make_key(names, index.version, TOP_K)
+    return await symptom_result_cache.aget_or_compute(key, compute)
+
+
+def calculate_disease_probability_batch(symptom_lists, top_k=TOP_K):
+    """
+    Score many symptom lists at once with a single matrix-matrix product.
+    return: one result list (as calculate_disease_probability) per input list
+    """
+    index = get_symptom_index()
+    name_lists = [index.resolve(symptoms) for symptoms in symptom_lists]
+
+    def compute_missing(positions):
+        return _compute(index, [name_lists[i] for i in positions], top_k)
+
+    keys = [symptom_result_cache.make_key(names, index.version, top_k) for names in name_lists]
+    return symptom_result_cache.get_or_compute_many(keys, compute_missing)
@@ -0,0 +1,113 @@
+"""
+Approximate nearest-neighbour index options for the chatbot vector store.
+
+build_vector_db always assembles an exact (flat) index first; these helpers
+turn its vectors into the index that is actually served:
+
+- 'flat'  exact search; optionally fp16/int8 scalar-quantised codes
+- 'ivf'   inverted file with nlist centroids, probing nprobe lists per query;
+          codes are PQ (--pq-m sub-quantisers) or fp16/int8/float32
+- 'hnsw'  graph index searched with efSearch; fp16/int8/float32 storage
+
+Everything is described by a FAISS index_factory string plus the search
+parameters, both recorded in the manifest so DocTalkChatbot can apply them.
+"""
+import math
+import time
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ('flat', 'ivf', 'hnsw')
+COMPRESSIONS = {'none': 'Flat', 'fp16': 'SQfp16', 'int8': 'SQ8'}
+
+# FAISS wants ~39 training points per centroid (and 256 per PQ code) for k-means
+MIN_POINTS_PER_CENTROID = 39
+
+NPROBE_GRID = (1, 2, 4, 8, 16, 32, 64, 128)
+EF_SEARCH_GRID = (16, 32, 64, 128, 256)
+
+
+def default_nlist(n):
+    """~4*sqrt(n) lists, but never more than the data can train."""
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+
+def factory_string(index_type, dim, compression='none', nlist=None, pq_m=0, pq_bits=8, hnsw_m=32):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}'")
+    codes = COMPRESSIONS[compression]
+
+    if pq_m:
+        if index_type != 'ivf':
+            raise ValueError("Product quantisation (--pq-m) is only available with --index-type ivf")
+        if compression != 'none':
+            raise ValueError("--pq-m and --compression are alternatives; pick one")
+        if dim % pq_m:
+            raise ValueError(f"--pq-m must divide the embedding dimension ({dim})")
+        codes = f"PQ{pq_m}x{pq_bits}"
+
+    if index_type == 'flat':
+        return codes
+    if index_type == 'ivf':
+        return f"IVF{nlist},{codes}"
+    return f"HNSW{hnsw_m}" if codes == 'Flat' else f"HNSW{hnsw_m},{codes}"
+
+
+def training_sample(vectors, train_size, seed=0):
+    """Uniform random rows (reproducible), or all of them if there are fewer."""
+    if len(vectors) <= train_size:
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), size=train_size, replace=False)
+    return vectors[np.sort(rows)]
+
+
+def build_index(vectors, factory, train_size, ef_construction=200, seed=0):
+    """Build the served index from the exact vectors, keeping their row order."""
+    index = faiss.index_factory(vectors.shape[1], factory)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = ef_construction
+    if not index.is_trained:
+        index.train(training_sample(vectors, train_size, seed))
+    index.add(vectors)
+    return index
+
+
+def apply_search_params(index, params):
+    """Set nprobe / efSearch on a (possibly memory-mapped) index."""
+    space = faiss.ParameterSpace()
+    for name, value in (params or {}).items():
+        space.set_index_parameter(index, name, value)
+
+
+def search_param_grid(factory, nlist=None):
+    """The knob worth sweeping for a given index, as [{param: value}, ...]."""
+    if factory.startswith('IVF'):
+        return [{'nprobe': n} for n in NPROBE_GRID if n <= nlist]
+    if factory.startswith('HNSW'):
+        return [{'efSearch': ef} for ef in EF_SEARCH_GRID]
+    return [{}]
+
+
+def _latency_ms(index, queries, k):
+    # One query at a time, like the chatbot
+    started = time.perf_counter()
+    results = [index.search(queries[i:i + 1], k)[1][0] for i in range(len(queries))]
+    return (time.perf_counter() - started) * 1000 / len(queries), np.asarray(results)
+
+
+def recall_report(exact_index, index, queries, k, grid):
+    """
+    recall@k of `index` against `exact_index` for each search setting in
+    `grid`, with mean single-query latency. Returns (exact_ms, rows).
+    """
+    exact_ms, truth = _latency_ms(exact_index, queries, k)
+    rows = []
+    for params in grid:
+        apply_search_params(index, params)
+        ms, found = _latency_ms(index, queries, k)
+        hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+        rows.append({'params': params, 'recall': hits / truth.size, 'latency_ms': ms})
+    return exact_ms, rows
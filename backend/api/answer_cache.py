@@ -0,0 +1,161 @@
+"""
+Semantic answer cache for DocTalkChatbot.
+
+Past questions are embedded into a small in-memory FAISS inner-product index
+(vectors are unit-normalised, so scores are cosine similarities). Similarity
+alone is not enough to reuse a medical answer: "symptoms of type 1 diabetes"
+and "... type 2 diabetes" embed above any useful threshold. Every entry is
+therefore keyed on the question's entities (the disease it names and its
+other key terms, see DiseaseLookup.entities) and on a fingerprint of the
+retrieved context, and a cached answer is only served when both match
+exactly and the cached question is a near duplicate (or the same question
+after normalisation, which needs no embedding).
+
+Entries expire after a TTL, the oldest are evicted past max_entries, and the
+whole cache is tied to the build id of the knowledge vector store it was
+answered from.
+"""
+import hashlib
+import threading
+import time
+
+import faiss
+import numpy as np
+
+# Near neighbours checked for one whose entities and context match
+LOOKUP_CANDIDATES = 8
+
+
+def normalize_question(question):
+    return ' '.join(question.lower().split())
+
+
+def context_fingerprint(context):
+    """Identifies the context an answer was generated from."""
+    return hashlib.sha1(context.encode('utf-8')).hexdigest()
+
+
+class SemanticAnswerCache:
+    def __init__(self, embeddings, index_version, entities_for, threshold=0.95, ttl=3600, max_entries=1000):
+        """entities_for: question -> hashable entities; questions with different entities never share answers."""
+        self.embeddings = embeddings
+        self.entities_for = entities_for
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+        self.reset(index_version)
+
+    def reset(self, index_version):
+        """Drop every entry; called when the knowledge vector store changes."""
+        with self._lock:
+            self.index_version = index_version
+            self._index = None
+            # id -> (question, answer, created_at, generation_seconds, key); insertion ordered
+            self._entries = {}
+            # (normalised question, key) -> id, answered without embedding the question
+            self._exact = {}
+            self._next_id = 0
+
+    def _vector(self, question):
+        vector = np.asarray([self.embeddings.embed_query(question)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _key(self, question, fingerprint):
+        return self.entities_for(question), fingerprint
+
+    def _remove(self, ids):
+        self._index.remove_ids(np.asarray(ids, dtype=np.int64))
+        for entry_id in ids:
+            question, _, _, _, key = self._entries.pop(entry_id)
+            exact = (normalize_question(question), key)
+            if self._exact.get(exact) == entry_id:
+                del self._exact[exact]
+
+    def _fresh(self, entry_id, now):
+        if now - self._entries[entry_id][2] > self.ttl:
+            self._remove([entry_id])
+            return False
+        return True
+
+    def _find(self, question, key, now):
+        """Live entry for the same normalised question and key, or None; caller holds the lock."""
+        entry_id = self._exact.get((normalize_question(question), key))
+        if entry_id is not None and self._fresh(entry_id, now):
+            return self._entries[entry_id]
+        return None
+
+    def _find_similar(self, vector, key, now):
+        if self._index is None or not self._index.ntotal:
+            return None
+        scores, ids = self._index.search(vector, min(LOOKUP_CANDIDATES, self._index.ntotal))
+        for score, entry_id in zip(scores[0], ids[0].tolist()):
+            if entry_id == -1 or score < self.threshold:
+                break
+            if self._entries[entry_id][4] == key and self._fresh(entry_id, now):
+                return self._entries[entry_id]
+        return None
+
+    def lookup(self, question, fingerprint):
+        """
+        Return the cached answer to a near-duplicate question with the same
+        entities, answered from the same context (see context_fingerprint), or None.
+        """
+        started = time.perf_counter()
+        key = self._key(question, fingerprint)
+        with self._lock:
+            entry = self._find(question, key, time.time())
+        if entry is None:
+            vector = self._vector(question)
+            with self._lock:
+                entry = self._find_similar(vector, key, time.time())
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_seconds += entry[3]
+            self.lookup_seconds += time.perf_counter() - started
+        return entry[1] if entry is not None else None
+
+    def store(self, question, fingerprint, answer, generation_seconds, index_version):
+        key = self._key(question, fingerprint)
+        vector = self._vector(question)
+        with self._lock:
+            if index_version != self.index_version:
+                # Answered from an index that has since been replaced
+                return
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (question, answer, time.time(), generation_seconds, key)
+            self._exact[normalize_question(question), key] = entry_id
+
+            now = time.time()
+            stale = [i for i, entry in self._entries.items() if now - entry[2] > self.ttl]
+            overflow = len(self._entries) - len(stale) - self.max_entries
+            if overflow > 0:
+                # Oldest first: entries are kept in insertion order
+                expired = set(stale)
+                stale.extend([i for i in self._entries if i not in expired][:overflow])
+            if stale:
+                self._remove(stale)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'generation_seconds_saved': round(self.saved_seconds, 3),
+                'avg_lookup_ms': round(self.lookup_seconds / total * 1000, 3) if total else 0.0,
+            }
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Keep the compiled symptom index in sync with catalogue writes; time ORM queries
+        from . import signals  # noqa: F401
+        # Refuse to start with chat sessions in per-process memory
+        from . import checks  # noqa: F401
+
+        from django.conf import settings
+        from .warmup import should_warm_up, start_warmup
+
+        # Load the chatbot in the background so the first request after a cold start doesn't
+        # wait for the vector store, embeddings and LLM client to be built
+        if should_warm_up(settings.CHATBOT_WARMUP):
+            start_warmup()
@@ -0,0 +1,371 @@
+"""
+Offline benchmark suites behind `manage.py benchmark`.
+
+Nothing here talks to Google: embeddings use the 'fake' backend (hashing
+vectors plus a simulated per-call latency) and the chatbot uses
+FakeChatModel, so runs are reproducible and free. Catalogues, corpora and
+vectors are synthetic and seeded.
+
+- scoring:   calculate_disease_probability against catalogues of 10 to 100k
+             diseases (result cache bypassed, so every call is scored)
+- retrieval: single-query FAISS search for flat / HNSW / IVF indexes at
+             several corpus sizes, with recall@k against exact search
+- build:     build_vector_db throughput (chunks/s) for synthetic catalogues
+- http:      end-to-end throughput and latency of /api/symptom-check/,
+             /api/chat/ and /api/doctors/ with concurrent async clients
+
+Each suite returns {case name: {metric: value}}. Metric names say which way
+is better: *_ms and *_seconds are lower-is-better, *_per_sec and recall are
+higher-is-better; compare() uses that to flag regressions against a saved
+baseline.
+"""
+import asyncio
+import json
+import os
+import platform
+import time
+from io import StringIO
+
+import faiss
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.test import AsyncClient, override_settings
+
+from .ann_index import apply_search_params, build_index, default_nlist, factory_string
+
+SUITES = ('scoring', 'retrieval', 'build', 'http')
+
+SEVERITIES = ('Low', 'Medium', 'High', 'Critical')
+SPECIALISTS = ('General Physician', 'Cardiologist', 'Pulmonologist', 'Neurologist', 'Dermatologist')
+SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'sho', 'vi', 'ze', 'do', 'pa', 'gri')
+TREATMENTS = ('Rest', 'Fluids', 'Paracetamol', 'Antibiotics', 'Herbal tea', 'Yoga', 'Physiotherapy')
+CHAT_QUESTIONS = (
+    "Can {} cause complications in older adults?",
+    "Is {} contagious between family members?",
+    "How long does recovery from {} usually take?",
+    "Should I see a specialist if I think I have {}?",
+)
+
+HIGHER_IS_BETTER = ('_per_sec', 'recall')
+LOWER_IS_BETTER = ('_ms', '_seconds')
+
+
+# -- measurement -------------------------------------------------------------
+
+def summarize(latencies, wall_seconds=None):
+    """Latency percentiles (ms) for a list of per-call seconds, plus throughput."""
+    samples = np.asarray(latencies, dtype=np.float64) * 1000
+    wall_seconds = wall_seconds if wall_seconds is not None else samples.sum() / 1000
+    return {
+        'n': int(samples.size),
+        'mean_ms': round(float(samples.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'ops_per_sec': round(samples.size / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+
+
+def measure(fn, inputs, warmup=5):
+    """Call fn(x) for each input, after a few untimed warm-up calls."""
+    for x in inputs[:warmup]:
+        fn(x)
+    latencies = []
+    for x in inputs:
+        started = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+# -- synthetic data ----------------------------------------------------------
+
+def _word(rng, syllables):
+    return ''.join(rng.choice(SYLLABLES, size=syllables))
+
+
+def synthetic_symptoms(n, rng):
+    names = []
+    seen = set()
+    while len(names) < n:
+        name = f"{_word(rng, 3)} {_word(rng, 2)}"
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def synthetic_catalogue(n_diseases, seed=0):
+    """
+    [(name, symptoms, treatments, severity, specialist), ...] with 3-10
+    symptoms each, drawn Zipf-like from a vocabulary that grows with the
+    catalogue so common symptoms are shared by many diseases.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = synthetic_symptoms(int(np.clip(n_diseases // 2, 40, 5000)), rng)
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1) ** 0.8
+    weights /= weights.sum()
+    rows = []
+    for i in range(n_diseases):
+        picked = rng.choice(len(vocabulary), size=int(rng.integers(3, 11)), replace=False, p=weights)
+        rows.append((
+            f"{_word(rng, 3).capitalize()} syndrome {i}",
+            [vocabulary[j] for j in picked],
+            list(rng.choice(TREATMENTS, size=2, replace=False)),
+            SEVERITIES[i % len(SEVERITIES)],
+            SPECIALISTS[i % len(SPECIALISTS)],
+        ))
+    return rows, vocabulary
+
+
+def write_catalogue_csv(path, rows):
+    """diseases.csv format (see disease_catalogue.py)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('disease,symptoms,treatment\n')
+        for name, symptoms, treatments, _, _ in rows:
+            f.write(f"{name},{', '.join(symptoms)},{', '.join(treatments)}.\n")
+
+
+def symptom_queries(vocabulary, count, seed=1):
+    rng = np.random.default_rng(seed)
+    return [
+        [vocabulary[j] for j in rng.choice(len(vocabulary), size=int(rng.integers(2, 6)), replace=False)]
+        for _ in range(count)
+    ]
+
+
+def clustered_vectors(n, dim, seed=0, clusters=64):
+    """Unit vectors around random centroids, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+# -- suites ------------------------------------------------------------------
+
+def bench_scoring(sizes, queries=300, seed=0):
+    from . import symptom_index
+    from .ai_engine import calculate_disease_probability
+    from .symptom_index import SymptomIndex, get_catalogue_version
+
+    results = {}
+    # Dummy result cache: every call is scored, not served from the cache
+    caches = {**settings.CACHES, settings.SYMPTOM_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }}
+    with override_settings(CACHES=caches):
+        for size in sizes:
+            rows, vocabulary = synthetic_catalogue(size, seed)
+            disease_rows = [(i, name, severity, specialist) for i, (name, _, _, severity, specialist) in enumerate(rows)]
+            links = [(i, symptom) for i, (_, symptoms, _, _, _) in enumerate(rows) for symptom in symptoms]
+
+            started = time.perf_counter()
+            index = SymptomIndex(get_catalogue_version(), disease_rows, links)
+            build_seconds = time.perf_counter() - started
+            # Served as the current index, exactly as if compiled from the Disease table
+            with symptom_index._index_lock:
+                symptom_index._index = index
+
+            stats = measure(
+                lambda symptoms: calculate_disease_probability(symptoms, None, None),
+                symptom_queries(vocabulary, queries, seed + 1),
+            )
+            stats['index_build_seconds'] = round(build_seconds, 4)
+            results[f"scoring/diseases={size}"] = stats
+    symptom_index.bump_catalogue_version()
+    return results
+
+
+def bench_retrieval(sizes, index_types=('flat', 'hnsw', 'ivf'), queries=200, k=3, dim=384, seed=0):
+    results = {}
+    for size in sizes:
+        vectors = clustered_vectors(size, dim, seed)
+        rng = np.random.default_rng(seed + 1)
+        query_vectors = vectors[rng.integers(0, size, size=queries)] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+        faiss.normalize_L2(query_vectors)
+
+        exact = faiss.IndexFlatL2(dim)
+        exact.add(vectors)
+        truth = exact.search(query_vectors, k)[1]
+
+        for index_type in index_types:
+            nlist = default_nlist(size)
+            if index_type == 'ivf' and nlist < 2:
+                continue
+            started = time.perf_counter()
+            index = build_index(vectors, factory_string(index_type, dim, nlist=nlist), train_size=50000)
+            build_seconds = time.perf_counter() - started
+            # The build_vector_db defaults
+            apply_search_params(index, {'ivf': {'nprobe': min(16, nlist)}, 'hnsw': {'efSearch': 64}}.get(index_type))
+
+            found = []
+            stats = measure(lambda q: found.append(index.search(q, k)[1][0]), [q[None, :] for q in query_vectors], warmup=0)
+            hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+            stats['recall'] = round(hits / truth.size, 4)
+            stats['build_seconds'] = round(build_seconds, 4)
+            results[f"retrieval/{index_type}/n={size}"] = stats
+    return results
+
+
+def _prepare_base_dir(base_dir, rows):
+    data = os.path.join(base_dir, 'data')
+    os.makedirs(data, exist_ok=True)
+    write_catalogue_csv(os.path.join(data, 'diseases.csv'), rows)
+
+
+def _build_vector_store(base_dir, embedding_latency, batch_size=64, workers=4):
+    with override_settings(BASE_DIR=base_dir, EMBEDDING_BACKEND='fake', FAKE_EMBEDDING_LATENCY=embedding_latency):
+        started = time.perf_counter()
+        call_command(
+            'build_vector_db', '--full', f'--batch-size={batch_size}', f'--workers={workers}',
+            stdout=StringIO(),
+        )
+        seconds = time.perf_counter() - started
+    return seconds
+
+
+def bench_build(sizes, base_dir, embedding_latency, batch_size=64, workers=4, seed=0):
+    results = {}
+    for size in sizes:
+        run_dir = os.path.join(base_dir, f'build-{size}')
+        rows, _ = synthetic_catalogue(size, seed)
+        _prepare_base_dir(run_dir, rows)
+        seconds = _build_vector_store(run_dir, embedding_latency, batch_size, workers)
+        with open(os.path.join(run_dir, 'vectorstore', 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        chunks = len(manifest['chunks'])
+        results[f"build/rows={size}"] = {
+            'chunks': chunks,
+            'build_seconds': round(seconds, 3),
+            'chunks_per_sec': round(chunks / seconds, 2),
+        }
+    return results
+
+
+async def _hammer(client, method, path, payloads, concurrency):
+    """Send one request per payload, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(payload):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            if method == 'get':
+                response = await client.get(path)
+            else:
+                response = await client.post(path, json.dumps(payload), content_type='application/json')
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    stats = summarize(latencies, time.perf_counter() - started)
+    stats['errors'] = errors
+    return stats
+
+
+def _seed_database(rows, csv_path, doctors):
+    from .models import DoctorProfile, User
+
+    write_catalogue_csv(csv_path, rows)
+    call_command('import_catalogue', path=csv_path, stdout=StringIO())
+    users = User.objects.bulk_create([
+        User(username=f'bench-doctor-{i}', last_name=f'Doctor{i}', role='doctor') for i in range(doctors)
+    ])
+    DoctorProfile.objects.bulk_create([
+        DoctorProfile(user=user, specialization=SPECIALISTS[i % len(SPECIALISTS)], qualification='MBBS')
+        for i, user in enumerate(users)
+    ])
+
+
+def bench_http(base_dir, requests=200, concurrency=8, diseases=500, doctors=50,
+               llm_latency=0.5, embedding_latency=0.05, seed=0):
+    """Run against the test database the benchmark command sets up."""
+    from .chatbot_logic import DocTalkChatbot
+
+    rows, vocabulary = synthetic_catalogue(diseases, seed)
+    _prepare_base_dir(base_dir, rows)
+    _seed_database(rows, os.path.join(base_dir, 'catalogue.csv'), doctors)
+    _build_vector_store(base_dir, embedding_latency)
+
+    symptom_payloads = [{'symptoms': symptoms} for symptoms in symptom_queries(vocabulary, requests, seed + 1)]
+    rng = np.random.default_rng(seed + 2)
+    chat_payloads = [
+        {'message': CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)].format(rows[int(rng.integers(len(rows)))][0])}
+        for i in range(requests)
+    ]
+
+    with override_settings(
+        BASE_DIR=base_dir,
+        EMBEDDING_BACKEND='fake',
+        FAKE_EMBEDDING_LATENCY=embedding_latency,
+        LLM_BACKEND='fake',
+        FAKE_LLM_LATENCY=llm_latency,
+        # Measure retrieval + generation, not repeats served from the answer cache
+        ANSWER_CACHE_ENABLED=False,
+        CHATBOT_RELOAD_INTERVAL=3600,
+    ):
+        # Pick up the fake backends and this vector store
+        DocTalkChatbot._instance = None
+        DocTalkChatbot()
+
+        async def run():
+            client = AsyncClient()
+            return {
+                'http/symptom-check': await _hammer(client, 'post', '/api/symptom-check/', symptom_payloads, concurrency),
+                'http/chat': await _hammer(client, 'post', '/api/chat/', chat_payloads, concurrency),
+                'http/doctors': await _hammer(client, 'get', '/api/doctors/', [None] * requests, concurrency),
+            }
+
+        try:
+            return asyncio.run(run())
+        finally:
+            DocTalkChatbot._instance = None
+
+
+# -- reporting ---------------------------------------------------------------
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'faiss': faiss.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def _direction(metric):
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    [(case, metric, baseline, current, relative change, regressed)] for every
+    directional metric present in both runs. A metric regresses when it is
+    worse than the baseline by more than `tolerance` (0.1 = 10%).
+    """
+    rows = []
+    for case, metrics in sorted(results.items()):
+        previous = baseline.get(case)
+        if previous is None:
+            continue
+        for metric, value in metrics.items():
+            direction = _direction(metric)
+            old = previous.get(metric)
+            if not direction or not isinstance(old, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            change = (value - old) / old if old else 0.0
+            rows.append((case, metric, old, value, change, direction * change < -tolerance))
+    return rows
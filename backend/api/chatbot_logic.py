@@ -1,131 +1,576 @@
 import os
+import threading
+import time
+import weakref
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from dotenv import load_dotenv
 
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import (
-    GoogleGenerativeAIEmbeddings,
-    ChatGoogleGenerativeAI
-)
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from . import warmup
+from .ann_index import apply_search_params
+from .answer_cache import SemanticAnswerCache, context_fingerprint
+from .context import get_context_assembler
+from .conversation import Conversation, format_turns, needs_history
+from .disease_lookup import aget_disease_lookup, get_disease_lookup
+from .embeddings import embedding_backend_id, get_query_embeddings, normalize_query
+from .faiss_store import load_vector_store
+from .llm_scheduler import BACKGROUND, LLMUnavailableError, get_llm_scheduler
+from .metrics import timed
+from .retrieval import DiseaseFilteredRetriever, count_disease_chunks
+from .vector_store import MANIFEST_NAME, load_manifest
+
 load_dotenv()
 
+RAG_PROMPT = """
+You are DocTalk AI, a medical assistant.
+You do NOT diagnose diseases.
+Use ONLY the provided context.
+If unsure, say you don't know and advise consulting a doctor.
+
+{history}
+
+Context:
+{context}
+
+Question:
+{question}
+
+Answer:
+"""
+
+FALLBACK_PROMPT = "You are DocTalk AI, a helpful medical assistant. Answer the user's question safely. {history}\nQuestion: {question}"
+
+CONDENSE_PROMPT = """
+Rewrite the user's follow-up message as a standalone medical question that can be
+understood without the conversation. Reply with the question only.
+
+{history}
+
+Follow-up: {question}
+
+Standalone question:
+"""
+
+SUMMARY_PROMPT = """
+Update the summary of a conversation between a user and DocTalk AI, a medical
+assistant, with the exchanges below. Keep the conditions, symptoms and medicines
+discussed. At most 80 words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{turns}
+
+Updated summary:
+"""
+
+def _make_llm(api_key):
+    if settings.LLM_BACKEND == 'fake':
+        from .fake_llm import FakeChatModel
+
+        return FakeChatModel(latency=settings.FAKE_LLM_LATENCY)
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash",
+        temperature=0.3,
+        google_api_key=api_key
+    )
+
+def _history_block(conversation):
+    if conversation is None or conversation.is_empty:
+        return ""
+    return "Conversation so far:\n" + conversation.history_text()
+
+def _error_message(e):
+    if isinstance(e, LLMUnavailableError) or "429" in str(e):
+        return "High traffic right now. Please try again shortly."
+    return "An error occurred while processing your request."
+
+def _vector_store_path():
+    return os.path.join(settings.BASE_DIR, "vectorstore")
+
+def _vector_store_signature(db_path):
+    """
+    Changes whenever build_vector_db finishes writing a new index. The manifest
+    is written last, so it is watched instead of the index files while they are
+    still being replaced; stores without one fall back to index.faiss.
+    """
+    for name in (MANIFEST_NAME, "index.faiss"):
+        try:
+            return name, os.stat(os.path.join(db_path, name)).st_mtime_ns
+        except OSError:
+            continue
+    return None
+
+class _Pipeline:
+    """
+    Everything tied to one loaded vector store. Requests take a reference at
+    the start and use only that, so a reload can swap in a new pipeline while
+    in-flight requests finish on the old one.
+    """
+    __slots__ = ('retriever', 'answer_chain', 'index_version', 'signature', '__weakref__')
+
+    def __init__(self, retriever, answer_chain, index_version, signature):
+        self.retriever = retriever
+        self.answer_chain = answer_chain
+        self.index_version = index_version
+        self.signature = signature
+
 class DocTalkChatbot:
     _instance = None
+    _init_lock = threading.Lock()
 
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_bot()
+        instance = cls._instance
+        if instance is None:
+            # Callers arriving during initialisation (e.g. the startup warm-up) wait here
+            with cls._init_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_bot()
+                    # Only published once fully built
+                    cls._instance = instance
+                instance = cls._instance
+        return instance
+
+    @classmethod
+    def get_if_ready(cls):
+        """The bot if it has been built, without blocking or triggering initialisation."""
         return cls._instance
 
+    @property
+    def mode(self):
+        if not self.answer_chain:
+            return "unavailable"
+        return "rag" if self.retriever is not None else "fallback"
+
+    # Read-only views of the current pipeline
+    @property
+    def retriever(self):
+        return self._pipeline.retriever if self._pipeline else None
+
+    @property
+    def answer_chain(self):
+        return self._pipeline.answer_chain if self._pipeline else None
+
+    @property
+    def index_version(self):
+        return self._pipeline.index_version if self._pipeline else None
+
     def _init_bot(self):
         api_key = os.getenv("GOOGLE_API_KEY")
-        self.chain = None
+        self._pipeline = None
+        self.llm = None
+        self.query_embeddings = None
+        self.answer_cache = None
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self._retired = None
+        self._next_check = time.monotonic() + settings.CHATBOT_RELOAD_INTERVAL
+        self._condense_chain = None
+        self._summary_chain = None
+        self._folding = set()
+        self._folding_lock = threading.Lock()
 
-        if not api_key:
+        if not api_key and settings.LLM_BACKEND != 'fake':
             print("❌ GOOGLE_API_KEY missing")
             return
 
         try:
-            # Load vector DB
-            db_path = os.path.join(settings.BASE_DIR, "vectorstore")
-            if not os.path.exists(os.path.join(db_path, "index.faiss")):
-                 raise FileNotFoundError("Vector store not found")
-
-            embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001",
-                google_api_key=api_key
-            )
+            with warmup.stage('llm'):
+                self.llm = _make_llm(api_key)
+                # Conversation sessions: follow-ups are rewritten before retrieval and
+                # older turns are summarised
+                self._condense_chain = PromptTemplate.from_template(CONDENSE_PROMPT) | self.llm | StrOutputParser()
+                self._summary_chain = PromptTemplate.from_template(SUMMARY_PROMPT) | self.llm | StrOutputParser()
 
-            vectordb = FAISS.load_local(
-                db_path,
-                embeddings,
-                allow_dangerous_deserialization=True
-            )
+            with warmup.stage('embeddings'):
+                # Repeated questions reuse their query embedding instead of a remote call
+                self.query_embeddings = get_query_embeddings(api_key)
+        except Exception as e:
+            print(f"❌ Chatbot init failed: {e}")
+            return
 
-            retriever = vectordb.as_retriever(search_kwargs={"k": 3})
+        db_path = _vector_store_path()
+        try:
+            with warmup.stage('vector_store'):
+                self._pipeline = self._load_pipeline(db_path)
+            self._reset_answer_cache(self.index_version)
+            print("✅ DocTalk chatbot ready")
+        except Exception as e:
+            print(f"❌ RAG init failed: {e}. Switching to fallback mode.")
+            self._pipeline = self._fallback_pipeline(_vector_store_signature(db_path))
+
+    def _load_pipeline(self, db_path):
+        # Taken before loading: if the store changes mid-load, the next check reloads again
+        signature = _vector_store_signature(db_path)
+        if not os.path.exists(os.path.join(db_path, "index.faiss")):
+             raise FileNotFoundError("Vector store not found")
 
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.0-flash",
-                temperature=0.3,
-                google_api_key=api_key
+        # Never query an index with vectors from a different embedding space.
+        # Indexes built before the manifest existed were always Google-embedded.
+        manifest = load_manifest(db_path)
+        index_backend = manifest['embedding_backend'] if manifest else "google:models/embedding-001"
+        if index_backend != embedding_backend_id():
+            raise ValueError(
+                f"Vector store was built with '{index_backend}' but EMBEDDING_BACKEND is "
+                f"'{embedding_backend_id()}'. Rebuild it with build_vector_db"
             )
 
-            prompt = PromptTemplate(
-                input_variables=["context", "question"],
-                template="""
-You are DocTalk AI, a medical assistant.
-You do NOT diagnose diseases.
-Use ONLY the provided context.
-If unsure, say you don't know and advise consulting a doctor.
+        # Memory-mapped: all workers share one page-cache copy of the index and chunks
+        if manifest is not None and not manifest.get('unit_vectors'):
+            print("⚠️ Vector store predates unit-length embeddings; relevance scores may be off until it is rebuilt")
 
-Context:
-{context}
+        vectordb = load_vector_store(db_path, self.query_embeddings)
+        # nprobe / efSearch chosen at build time for approximate indexes
+        apply_search_params(vectordb.index, (manifest or {}).get('index', {}).get('search_params'))
 
-Question:
-{question}
+        # Catalogue rows about other diseases are dropped when the question names one
+        disease_chunks = (manifest or {}).get('disease_chunks')
+        retriever = DiseaseFilteredRetriever(
+            vectorstore=vectordb,
+            disease_for=self._mentioned_disease,
+            k=3,
+            disease_chunks=count_disease_chunks(disease_chunks) if disease_chunks is not None else None,
+        )
 
-Answer:
-"""
-            )
+        prompt = PromptTemplate(
+            input_variables=["context", "question", "history"],
+            template=RAG_PROMPT
+        )
 
-            def format_docs(docs):
-                return "\n\n".join(doc.page_content for doc in docs)
-
-            self.chain = (
-                {
-                    "context": retriever | format_docs,
-                    "question": lambda x: x
-                }
-                | prompt
-                | llm
-                | StrOutputParser()
-            )
+        # Retrieval runs first and separately: the answer cache is keyed on its context
+        answer_chain = prompt | self.llm | StrOutputParser()
+        index_version = manifest.get('build_id') if manifest else 'legacy'
+        return _Pipeline(retriever, answer_chain, index_version, signature)
 
-            print("✅ DocTalk chatbot ready")
-            
+    def _fallback_pipeline(self, signature):
+        prompt = PromptTemplate(
+            input_variables=["question", "history"],
+            template=FALLBACK_PROMPT
+        )
+        answer_chain = prompt | self.llm | StrOutputParser()
+        print("⚠️ DocTalk chatbot running in fallback mode (No Context)")
+        return _Pipeline(None, answer_chain, None, signature)
+
+    def _reset_answer_cache(self, index_version):
+        if not settings.ANSWER_CACHE_ENABLED:
+            return
+        if self.answer_cache is not None:
+            self.answer_cache.reset(index_version)
+            return
+        # Near-duplicate questions are answered from here without a Gemini call
+        self.answer_cache = SemanticAnswerCache(
+            self.query_embeddings,
+            index_version,
+            self._question_entities,
+            threshold=settings.ANSWER_CACHE_THRESHOLD,
+            ttl=settings.ANSWER_CACHE_TTL,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        )
+
+    def check_for_reload(self):
+        """
+        Cheap, throttled check (a stat call) run at the start of each request.
+        When vectorstore/ has been rebuilt, the new index is loaded in a
+        background thread and swapped in; the current request is not delayed.
+        """
+        pipeline = self._pipeline
+        if pipeline is None or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + settings.CHATBOT_RELOAD_INTERVAL
+        if _vector_store_signature(_vector_store_path()) == pipeline.signature:
+            return
+
+        with self._reload_lock:
+            if self._reloading:
+                return
+            # At most two indexes in memory: wait until requests still using the
+            # one retired by the previous reload have finished and released it
+            if self._retired is not None and self._retired() is not None:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name='doctalk-index-reload', daemon=True).start()
+
+    def _reload(self):
+        db_path = _vector_store_path()
+        started = time.perf_counter()
+        try:
+            pipeline = self._load_pipeline(db_path)
         except Exception as e:
-            print(f"❌ RAG init failed: {e}. Switching to fallback mode.")
-            self._fallback_init(api_key)
+            print(f"❌ Vector store reload failed: {e}. Keeping the current index.")
+            with self._reload_lock:
+                # Don't retry the same broken build on every check
+                self._pipeline.signature = _vector_store_signature(db_path)
+                self._reloading = False
+            return
+
+        with self._reload_lock:
+            # Atomic swap: new requests see the new pipeline, in-flight ones keep theirs
+            self._retired = weakref.ref(self._pipeline)
+            self._pipeline = pipeline
+            self._reloading = False
+        # Answers from the old index must not be served for the new one
+        self._reset_answer_cache(pipeline.index_version)
+        print(f"🔄 Vector store reloaded in {time.perf_counter() - started:.2f}s ({pipeline.index_version})")
 
-    def _fallback_init(self, api_key):
+    def _fast_answer(self, query):
+        """Templated catalogue answer for single-disease questions; no embedding or LLM call."""
+        if not settings.CHAT_FAST_PATH_ENABLED:
+            return None
         try:
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.0-flash",
-                temperature=0.3,
-                google_api_key=api_key
-            )
-            
-            prompt = PromptTemplate(
-                input_variables=["question"],
-                template="You are DocTalk AI, a helpful medical assistant. Answer the user's question safely. Question: {question}"
-            )
-            
-            from langchain_core.runnables import RunnablePassthrough
-            
-            self.chain = (
-                {"question": RunnablePassthrough()}
-                | prompt
-                | llm
-                | StrOutputParser()
+            return get_disease_lookup().answer(query)
+        except Exception as e:
+            print(f"⚠️ Disease fast path failed: {e}")
+            return None
+
+    def _mentioned_disease(self, query):
+        return get_disease_lookup().mentioned_disease(query)
+
+    def _question_entities(self, query):
+        return get_disease_lookup().entities(query)
+
+    async def _afast_answer(self, query):
+        if not settings.CHAT_FAST_PATH_ENABLED:
+            return None
+        try:
+            return (await aget_disease_lookup()).answer(query)
+        except Exception as e:
+            print(f"⚠️ Disease fast path failed: {e}")
+            return None
+
+    def _flight_key(self, pipeline, query):
+        return f"{pipeline.index_version or 'fallback'}:{normalize_query(query)}"
+
+    def _answer_cache_for(self, pipeline):
+        # Only answers grounded in the knowledge base are cached
+        return self.answer_cache if pipeline.retriever is not None else None
+
+    @staticmethod
+    def _inputs(pipeline, docs, question, history):
+        if pipeline.retriever is None:
+            return {"question": question, "history": history}
+        return {"context": get_context_assembler().assemble(docs), "question": question, "history": history}
+
+    def _retrieve_inputs(self, pipeline, question, history):
+        docs = pipeline.retriever.invoke(question) if pipeline.retriever is not None else []
+        return docs, self._inputs(pipeline, docs, question, history)
+
+    async def _aretrieve_inputs(self, pipeline, question, history):
+        docs = await pipeline.retriever.ainvoke(question) if pipeline.retriever is not None else []
+        return docs, self._inputs(pipeline, docs, question, history)
+
+    async def _astandalone_question(self, conversation, query):
+        """The follow-up rewritten to stand on its own, for retrieval, the fast path and caching."""
+        if conversation is None or conversation.is_empty or not needs_history(query) or not self._condense_chain:
+            return query
+        try:
+            with timed('llm'):
+                standalone = await get_llm_scheduler().acall(
+                    lambda: self._condense_chain.ainvoke({"history": _history_block(conversation), "question": query})
+                )
+        except Exception as e:
+            print(f"⚠️ Could not condense follow-up question: {e}")
+            return query
+        standalone = standalone.strip()
+        return standalone if 0 < len(standalone) <= 500 else query
+
+    async def _aremember(self, conversation, query, answer):
+        if conversation is None:
+            return
+        conversation.add_turn(query, answer)
+        await conversation.asave()
+        if conversation.unfolded():
+            self._start_fold(conversation.session_id)
+
+    def _start_fold(self, session_id):
+        with self._folding_lock:
+            if session_id in self._folding or not self._summary_chain:
+                return
+            self._folding.add(session_id)
+        threading.Thread(target=self._fold, args=(session_id,), name='doctalk-summary', daemon=True).start()
+
+    def _fold(self, session_id):
+        """Summarise the turns that left the verbatim window, behind interactive calls."""
+        try:
+            conversation = Conversation.load(session_id)
+            turns = conversation.unfolded()
+            if not turns:
+                return
+            inputs = {"summary": conversation.summary or "(none)", "turns": format_turns(turns)}
+            summary = get_llm_scheduler().call(
+                lambda: self._summary_chain.invoke(inputs),
+                priority=BACKGROUND,
             )
-            print("⚠️ DocTalk chatbot running in fallback mode (No Context)")
+            # Reloaded: turns may have been added while summarising
+            conversation = Conversation.load(session_id)
+            conversation.fold(turns, summary.strip())
+            conversation.save()
         except Exception as e:
-            print(f"❌ Fallback init failed: {e}")
+            print(f"⚠️ Conversation summary failed: {e}")
+        finally:
+            with self._folding_lock:
+                self._folding.discard(session_id)
 
     def get_response(self, query: str) -> str:
-        if not self.chain:
+        """Stateless, blocking version of aget_response."""
+        self.check_for_reload()
+        pipeline = self._pipeline
+        if len(query) > 500:
+            return "Please ask a shorter medical question."
+
+        fast_answer = self._fast_answer(query)
+        if fast_answer is not None:
+            return fast_answer
+
+        if not pipeline:
             return "The chatbot is currently unavailable."
 
+        answer_cache = self._answer_cache_for(pipeline)
+        try:
+            _, inputs = self._retrieve_inputs(pipeline, query, "")
+            fingerprint = context_fingerprint(inputs.get("context", ""))
+            if answer_cache is not None:
+                cached = answer_cache.lookup(query, fingerprint)
+                if cached is not None:
+                    return cached
+
+            started = time.perf_counter()
+            # Identical questions already in flight share one Gemini call
+            with timed('llm'):
+                response = get_llm_scheduler().call(
+                    lambda: pipeline.answer_chain.invoke(inputs),
+                    key=self._flight_key(pipeline, query),
+                )
+            if answer_cache is not None:
+                answer_cache.store(query, fingerprint, response, time.perf_counter() - started, pipeline.index_version)
+            return response
+        except Exception as e:
+            return _error_message(e)
+
+    async def aget_response(self, query: str, session_id=None) -> str:
+        """
+        Async get_response: awaits the chain so a worker can keep many LLM calls
+        in flight. With a session_id the question is answered in the context of
+        that conversation, which is then updated.
+        """
+        self.check_for_reload()
+        pipeline = self._pipeline
         if len(query) > 500:
             return "Please ask a shorter medical question."
 
+        conversation = await Conversation.aload(session_id) if session_id else None
+        question = await self._astandalone_question(conversation, query)
+
+        fast_answer = await self._afast_answer(question)
+        if fast_answer is not None:
+            await self._aremember(conversation, query, fast_answer)
+            return fast_answer
+
+        if not pipeline:
+            return "The chatbot is currently unavailable."
+
+        answer_cache = self._answer_cache_for(pipeline)
+        history = _history_block(conversation)
         try:
-            return self.chain.invoke(query)
+            _, inputs = await self._aretrieve_inputs(pipeline, question, history)
+            fingerprint = context_fingerprint(inputs.get("context", ""))
+            if answer_cache is not None:
+                cached = await sync_to_async(answer_cache.lookup, thread_sensitive=False)(question, fingerprint)
+                if cached is not None:
+                    await self._aremember(conversation, query, cached)
+                    return cached
+
+            started = time.perf_counter()
+            # Answers that depend on a conversation are neither shared nor cached
+            with timed('llm'):
+                response = await get_llm_scheduler().acall(
+                    lambda: pipeline.answer_chain.ainvoke(inputs),
+                    key=None if history else self._flight_key(pipeline, question),
+                )
+            if answer_cache is not None and not history:
+                await sync_to_async(answer_cache.store, thread_sensitive=False)(
+                    question, fingerprint, response, time.perf_counter() - started, pipeline.index_version
+                )
+            await self._aremember(conversation, query, response)
+            return response
+        except Exception as e:
+            return _error_message(e)
+
+    async def astream_response(self, query: str, session_id=None):
+        """
+        Async generator of (event, data) pairs for server-sent events:
+        'retrieval' once the context is ready, 'token' per generated chunk,
+        then 'done' with timings, or 'error' with a user-facing message.
+        """
+        self.check_for_reload()
+        pipeline = self._pipeline
+        if len(query) > 500:
+            yield "error", {"message": "Please ask a shorter medical question."}
+            return
+
+        started = time.perf_counter()
+
+        def elapsed_ms():
+            return round((time.perf_counter() - started) * 1000, 1)
+
+        conversation = await Conversation.aload(session_id) if session_id else None
+        question = await self._astandalone_question(conversation, query)
+
+        fast_answer = await self._afast_answer(question)
+        if fast_answer is not None:
+            yield "retrieval", {"documents": 0, "cached": False, "fast_path": True, "retrieval_ms": elapsed_ms()}
+            yield "token", {"text": fast_answer}
+            await self._aremember(conversation, query, fast_answer)
+            yield "done", {"cached": False, "fast_path": True, "total_ms": elapsed_ms()}
+            return
+
+        if not pipeline:
+            yield "error", {"message": "The chatbot is currently unavailable."}
+            return
+
+        answer_cache = self._answer_cache_for(pipeline)
+        history = _history_block(conversation)
+        try:
+            docs, inputs = await self._aretrieve_inputs(pipeline, question, history)
+            retrieval_ms = elapsed_ms()
+            fingerprint = context_fingerprint(inputs.get("context", ""))
+            if answer_cache is not None:
+                cached = await sync_to_async(answer_cache.lookup, thread_sensitive=False)(question, fingerprint)
+                if cached is not None:
+                    yield "retrieval", {"documents": len(docs), "cached": True, "retrieval_ms": retrieval_ms}
+                    yield "token", {"text": cached}
+                    await self._aremember(conversation, query, cached)
+                    yield "done", {"cached": True, "total_ms": elapsed_ms()}
+                    return
+
+            yield "retrieval", {"documents": len(docs), "cached": False, "retrieval_ms": retrieval_ms}
+
+            first_token_ms = None
+            parts = []
+            with timed('llm'):
+                async with get_llm_scheduler().aslot():
+                    async for token in pipeline.answer_chain.astream(inputs):
+                        if first_token_ms is None:
+                            first_token_ms = elapsed_ms()
+                        parts.append(token)
+                        yield "token", {"text": token}
+
+            total_ms = elapsed_ms()
+            if answer_cache is not None and not history:
+                await sync_to_async(answer_cache.store, thread_sensitive=False)(
+                    question, fingerprint, "".join(parts), (total_ms - retrieval_ms) / 1000, pipeline.index_version
+                )
+            await self._aremember(conversation, query, "".join(parts))
+            yield "done", {
+                "cached": False,
+                "retrieval_ms": retrieval_ms,
+                "first_token_ms": first_token_ms,
+                "total_ms": total_ms,
+            }
         except Exception as e:
-            if "429" in str(e):
-                return "High traffic right now. Please try again shortly."
-            return "An error occurred while processing your request."
+            yield "error", {"message": _error_message(e)}
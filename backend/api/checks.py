@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends that keep entries in one process: a follow-up on another worker would start a new conversation
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register()
+def chat_session_cache_check(app_configs, **kwargs):
+    backend = settings.CACHES.get(settings.CHAT_SESSION_CACHE_ALIAS, {}).get('BACKEND')
+    if backend is None:
+        return [Error(
+            f"No '{settings.CHAT_SESSION_CACHE_ALIAS}' cache configured for chat sessions.",
+            hint="Add it to CACHES (Redis, or django.core.cache.backends.db.DatabaseCache).",
+            id='api.E001',
+        )]
+    if backend in PER_PROCESS_CACHES:
+        return [Error(
+            f"Chat sessions are stored in {backend}, which is not shared between workers.",
+            hint="Use Redis (set REDIS_URL) or django.core.cache.backends.db.DatabaseCache.",
+            id='api.E002',
+        )]
+    return []
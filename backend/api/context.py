@@ -0,0 +1,156 @@
+"""
+Context assembly for the RAG prompt.
+
+Instead of joining the k retrieved chunks verbatim, ContextAssembler:
+
+1. drops chunks whose relevance (cosine similarity, see retrieval.py) is
+   below min_relevance, or below relative_cutoff x the best chunk's, except
+   the catalogue row of a disease the question names, which goes first;
+2. removes text a chunk shares with an already kept one: neighbouring
+   chunks of the same document overlap by up to CHUNK_OVERLAP characters,
+   and a chunk contained in another is dropped entirely;
+3. keeps chunks in relevance order until the token budget is used up,
+   cutting the last one at a word boundary.
+
+Tokens are estimated at ~4 characters each, which is close enough for
+Gemini's tokenizer on English text and needs no network call. Tokens saved
+per request are logged at debug level and totalled in stats().
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# Shorter shared spans are coincidence, not chunk overlap
+MIN_OVERLAP_CHARS = 40
+# A trimmed tail shorter than this is not worth sending
+MIN_TAIL_TOKENS = 30
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _suffix_prefix_overlap(left, right):
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    if len(right) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = right[:MIN_OVERLAP_CHARS]
+    pos = left.find(probe, max(0, len(left) - len(right)))
+    while pos != -1:
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+    return 0
+
+
+def remove_overlap(text, kept):
+    """`text` without the spans it shares with the ends of already kept texts; '' if fully contained."""
+    for other in kept:
+        if text in other:
+            return ''
+        # other ... | shared | ... text
+        overlap = _suffix_prefix_overlap(other, text)
+        if overlap:
+            text = text[overlap:]
+        # text ... | shared | ... other
+        overlap = _suffix_prefix_overlap(text, other)
+        if overlap:
+            text = text[:-overlap]
+    return text.strip()
+
+
+def _trim(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * CHARS_PER_TOKEN]
+    space = cut.rfind(' ')
+    return (cut[:space] if space > 0 else cut).rstrip() + " …"
+
+
+class ContextAssembler:
+    def __init__(self, token_budget=600, min_relevance=0.15, relative_cutoff=0.85):
+        self.token_budget = token_budget
+        self.min_relevance = min_relevance
+        self.relative_cutoff = relative_cutoff
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_retrieved = 0
+        self.tokens_sent = 0
+
+    def select(self, docs):
+        """The context strings actually sent, most relevant first."""
+        scored = sorted(
+            (
+                (doc.metadata.get('relevance'), doc.metadata.get('named_disease', False), doc.page_content)
+                for doc in docs
+            ),
+            # The named disease's row first, then by relevance
+            key=lambda item: (not item[1], -(item[0] if item[0] is not None else float('inf'))),
+        )
+        best = max((score for score, _, _ in scored if score is not None), default=None)
+        floor = self.min_relevance
+        if best is not None:
+            floor = max(floor, best * self.relative_cutoff)
+
+        kept = []
+        remaining = self.token_budget
+        for score, named, text in scored:
+            if score is not None and score < floor and not named:
+                continue
+            text = remove_overlap(text, kept)
+            if not text:
+                continue
+            if estimate_tokens(text) > remaining:
+                # Keep at least the best chunk; otherwise only a useful-sized tail
+                if kept and remaining < MIN_TAIL_TOKENS:
+                    break
+                text = _trim(text, remaining)
+            kept.append(text)
+            remaining -= estimate_tokens(text)
+            if remaining <= 0:
+                break
+        return kept
+
+    def assemble(self, docs):
+        kept = self.select(docs)
+        context = "\n\n".join(kept)
+
+        retrieved = estimate_tokens("\n\n".join(doc.page_content for doc in docs))
+        sent = estimate_tokens(context)
+        with self._lock:
+            self.requests += 1
+            self.tokens_retrieved += retrieved
+            self.tokens_sent += sent
+        logger.debug("RAG context: %d/%d chunks, ~%d tokens (saved ~%d)", len(kept), len(docs), sent, retrieved - sent)
+        return context
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'tokens_retrieved': self.tokens_retrieved,
+                'tokens_sent': self.tokens_sent,
+                'tokens_saved': self.tokens_retrieved - self.tokens_sent,
+                'avg_tokens_sent': round(self.tokens_sent / self.requests, 1) if self.requests else 0.0,
+            }
+
+
+_assembler = None
+_assembler_lock = threading.Lock()
+
+
+def get_context_assembler():
+    global _assembler
+    if _assembler is None:
+        with _assembler_lock:
+            if _assembler is None:
+                _assembler = ContextAssembler(
+                    token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET,
+                    min_relevance=settings.CHAT_CONTEXT_MIN_RELEVANCE,
+                    relative_cutoff=settings.CHAT_CONTEXT_RELATIVE_CUTOFF,
+                )
+    return _assembler
@@ -0,0 +1,136 @@
+"""
+Server-side chat sessions, so follow-up questions ("what medicine for that?")
+work without the client re-sending the conversation.
+
+A session is kept in the CHAT_SESSION_CACHE_ALIAS cache under its id as a
+compact {'s': summary, 't': [[question, answer], ...]}. That cache is Redis
+when REDIS_URL is set and a database table otherwise, never per-process
+memory: a follow-up may reach a different worker.
+The last CHAT_SESSION_TURNS turns are kept verbatim (answers cut to
+ANSWER_MAX_CHARS); once there are more, DocTalkChatbot folds the older ones
+into a rolling summary of at most SUMMARY_MAX_CHARS in the background, so
+the history in the prompt stays the same size however long the
+conversation runs.
+
+If folding fails (Gemini busy) the turns stay and are folded next time; past
+twice CHAT_SESSION_TURNS the oldest are folded naively (their questions
+only), so a session never grows without bound.
+"""
+import re
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = 'chat_session:'
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+ANSWER_MAX_CHARS = 400
+SUMMARY_MAX_CHARS = 600
+
+# Words that only make sense with the earlier conversation
+REFERRING_WORDS = {
+    'it', 'its', 'this', 'that', 'these', 'those', 'they', 'them', 'their', 'he', 'she', 'him', 'her',
+    'his', 'same', 'above', 'else', 'also', 'more', 'another', 'other', 'again', 'instead',
+}
+FOLLOW_UP_STARTS = ('and ', 'what about', 'how about', 'why', 'but ', 'so ', 'then ')
+_WORD = re.compile(r"[\w']+")
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+def is_valid_session_id(session_id):
+    return isinstance(session_id, str) and bool(SESSION_ID_PATTERN.match(session_id))
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + " …"
+
+
+def needs_history(question):
+    """True if the question probably refers back to the conversation and must be condensed first."""
+    lowered = question.lower().strip()
+    words = _WORD.findall(lowered)
+    return len(words) <= 3 or lowered.startswith(FOLLOW_UP_STARTS) or any(w in REFERRING_WORDS for w in words)
+
+
+class Conversation:
+    __slots__ = ('session_id', 'summary', 'turns')
+
+    def __init__(self, session_id, summary='', turns=None):
+        self.session_id = session_id
+        self.summary = summary
+        self.turns = turns or []
+
+    @classmethod
+    def _from_cache(cls, session_id, data):
+        if not data:
+            return cls(session_id)
+        return cls(session_id, data['s'], [list(turn) for turn in data['t']])
+
+    @staticmethod
+    def _cache():
+        return caches[settings.CHAT_SESSION_CACHE_ALIAS]
+
+    @classmethod
+    def load(cls, session_id):
+        return cls._from_cache(session_id, cls._cache().get(KEY_PREFIX + session_id))
+
+    @classmethod
+    async def aload(cls, session_id):
+        return cls._from_cache(session_id, await cls._cache().aget(KEY_PREFIX + session_id))
+
+    def _cache_value(self):
+        return {'s': self.summary, 't': self.turns}
+
+    def save(self):
+        self._cache().set(KEY_PREFIX + self.session_id, self._cache_value(), timeout=settings.CHAT_SESSION_TTL)
+
+    async def asave(self):
+        await self._cache().aset(KEY_PREFIX + self.session_id, self._cache_value(), timeout=settings.CHAT_SESSION_TTL)
+
+    @property
+    def is_empty(self):
+        return not self.summary and not self.turns
+
+    def add_turn(self, question, answer):
+        self.turns.append([question, _clip(answer, ANSWER_MAX_CHARS)])
+        limit = 2 * settings.CHAT_SESSION_TURNS
+        if len(self.turns) > limit:
+            self.fold(self.turns[:-limit], naive_summary(self.summary, self.turns[:-limit]))
+
+    def unfolded(self):
+        """Turns that have dropped out of the verbatim window and wait to be summarised."""
+        keep = settings.CHAT_SESSION_TURNS
+        return self.turns[:-keep] if len(self.turns) > keep else []
+
+    def fold(self, turns, summary):
+        """Replace the given oldest turns by the new summary."""
+        if self.turns[:len(turns)] == turns:
+            self.turns = self.turns[len(turns):]
+            self.summary = _clip(summary, SUMMARY_MAX_CHARS)
+
+    def history_text(self):
+        """The conversation as it goes into the prompt: summary plus the turns not folded into it yet."""
+        lines = []
+        if self.summary:
+            lines.append(f"Summary of the earlier conversation: {self.summary}")
+        if self.turns:
+            lines.append(format_turns(self.turns))
+        return "\n".join(lines)
+
+
+def format_turns(turns):
+    return "\n".join(f"User: {question}\nDocTalk: {answer}" for question, answer in turns)
+
+
+def naive_summary(summary, turns):
+    """Summary without an LLM call: the earlier summary plus the questions asked."""
+    asked = "; ".join(question for question, _ in turns)
+    summary = f"{summary} The user also asked: {asked}." if summary else f"The user asked: {asked}."
+    # The most recent part matters most
+    return summary if len(summary) <= SUMMARY_MAX_CHARS else "… " + summary[-(SUMMARY_MAX_CHARS - 2):]
@@ -0,0 +1,71 @@
+"""
+Reader for data/diseases.csv.
+
+The file is not strictly valid CSV: the symptom and treatment lists are
+unquoted, comma-separated text. Columns are separated by a bare comma while
+list items are separated by ', ', which is what the parser relies on.
+"""
+import re
+from collections import namedtuple
+
+from .symptom_search import normalize_symptom
+
+_COLUMN_SEPARATOR = re.compile(r',(?! )')
+
+HOME_KEYWORDS = (
+    'rest', 'fluid', 'hydration', 'diet', 'exercise', 'sleep', 'ice', 'heat', 'compress',
+    'bath', 'steam', 'tea', 'honey', 'avoid', 'lifestyle', 'hygiene', 'elevation',
+)
+AYURVEDA_KEYWORDS = ('ayurved', 'herbal', 'turmeric', 'yoga', 'meditation')
+
+
+CatalogueRow = namedtuple('CatalogueRow', ['disease', 'symptoms', 'treatments'])
+
+
+def _split_items(text):
+    items = []
+    for item in text.split(', '):
+        item = item.strip().rstrip('.').strip()
+        if item:
+            items.append(item)
+    return items
+
+
+def parse_catalogue_line(line):
+    """'Common Cold,Runny nose, cough,Rest, fluids.' -> CatalogueRow, or None for junk lines."""
+    columns = _COLUMN_SEPARATOR.split(line.strip())
+    if len(columns) < 2 or not columns[0].strip():
+        return None
+    disease = columns[0].strip()
+    if len(columns) == 2:
+        # No treatment column could be told apart from the symptom list
+        symptom_text, treatment_text = columns[1], ''
+    else:
+        symptom_text, treatment_text = ', '.join(columns[1:-1]), columns[-1]
+
+    symptoms = []
+    for item in _split_items(symptom_text):
+        name = normalize_symptom(item)
+        if name and name not in symptoms:
+            symptoms.append(name)
+    return CatalogueRow(disease, symptoms, _split_items(treatment_text))
+
+
+def iter_catalogue(path):
+    """Stream CatalogueRows from a diseases.csv file, skipping the header."""
+    with open(path, encoding='utf-8') as f:
+        next(f, None)
+        for line in f:
+            row = parse_catalogue_line(line)
+            if row is not None:
+                yield row
+
+
+def treatment_type(treatment):
+    """Best-effort Medicine.type for a free-text treatment."""
+    text = treatment.lower()
+    if any(word in text for word in AYURVEDA_KEYWORDS):
+        return 'Ayurveda'
+    if any(re.search(rf'\b{word}', text) for word in HOME_KEYWORDS):
+        return 'Home'
+    return 'Allopathy'
@@ -0,0 +1,265 @@
+"""
+Structured fast path for chatbot questions about a single disease.
+
+"What are the symptoms of X?" / "How is X treated?" is answered exactly by
+the catalogue, so DocTalkChatbot asks this module first and only falls back
+to retrieval + Gemini when it declines. A question is answered here only when
+it is nothing but an intent phrase around a disease name:
+
+- the intent words (symptoms / treatment / what is / tell me about) and
+  filler are stripped from both ends of the question;
+- what is left must match a disease name or alias exactly, or be a typo of
+  one: trigram similarity of at least DISEASE_MATCH_THRESHOLD with the same
+  number of words, and short or numeric words ('type 2', 'hepatitis a')
+  matching exactly.
+
+Anything else ("can diabetes cause blindness?") goes to RAG. Names come from
+the Disease table (or data/diseases.csv when the table is empty) and the
+lookup is rebuilt whenever the catalogue version changes, like SymptomIndex.
+"""
+import os
+import re
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .disease_catalogue import iter_catalogue
+from .models import Disease, Medicine
+from .symptom_index import aget_catalogue_version, get_catalogue_version
+from .symptom_search import SymptomMatcher, normalize_symptom
+
+# Lower than it looks: _close_enough also requires matching words one by one
+DISEASE_MATCH_THRESHOLD = 0.6
+
+SYMPTOM_WORDS = {'symptom', 'symptoms', 'sign', 'signs', 'indication', 'indications'}
+TREATMENT_WORDS = {
+    'treatment', 'treatments', 'treat', 'treated', 'treating', 'cure', 'cures', 'cured',
+    'remedy', 'remedies', 'medicine', 'medicines', 'medication', 'medications', 'therapy',
+}
+OVERVIEW_WORDS = {'about', 'explain', 'describe'}
+TRAILING_WORDS = {'please', 'now', 'today'}
+FILLER_WORDS = {
+    'what', 'whats', 'which', 'are', 'is', 'the', 'of', 'for', 'a', 'an', 'and', 'or', 'to', 'in',
+    'how', 'do', 'does', 'you', 'i', 'can', 'could', 'would', 'tell', 'me', 'please', 'give', 'list',
+    'common', 'main', 'usual', 'typical', 'best', 'some', 'its', 'their', 'with', 'get', 'rid',
+}
+
+DISCLAIMER = "This is general information, not a diagnosis. Please consult a doctor for advice about your situation."
+
+# What a disease nobody has reviewed gets from the model; never shown as a medical claim
+UNCURATED_SEVERITY = Disease._meta.get_field('severity').default
+
+_PARENTHESISED = re.compile(r'\(([^)]*)\)')
+_WORD = re.compile(r"[\w']+")
+
+
+def disease_aliases(name):
+    """'Flu (Influenza)' -> ['flu influenza', 'flu', 'influenza']"""
+    aliases = [normalize_symptom(name.replace('(', ' ').replace(')', ' '))]
+    aliases.append(normalize_symptom(_PARENTHESISED.sub(' ', name)))
+    aliases.extend(normalize_symptom(inner) for inner in _PARENTHESISED.findall(name))
+    return [alias for i, alias in enumerate(aliases) if alias and alias not in aliases[:i]]
+
+
+def disease_identity(name):
+    """Word set of the full name: 'Flu (Influenza)' and 'Influenza (Flu)' are the same disease."""
+    return frozenset(disease_aliases(name)[0].split())
+
+
+def _close_enough(text, alias):
+    words, alias_words = text.split(), alias.split()
+    if len(words) != len(alias_words):
+        # 'hepatitis' is not a typo of 'hepatitis b'
+        return False
+    return all(
+        word == alias_word
+        for word, alias_word in zip(words, alias_words)
+        if len(word) <= 2 or any(c.isdigit() for c in word)
+    )
+
+
+class DiseaseLookup:
+    def __init__(self, version, entries):
+        """entries: [(name, symptoms, treatments, severity, specialist), ...]"""
+        self.version = version
+        self.entries = {}
+        alias_owners = {}
+        for name, symptoms, treatments, severity, specialist in entries:
+            entry = self.entries.setdefault(name, {
+                'name': name,
+                'symptoms': [],
+                'treatments': [],
+                'severity': severity,
+                'specialist': specialist,
+            })
+            # Diseases listed more than once are merged
+            entry['symptoms'].extend(s for s in symptoms if s not in entry['symptoms'])
+            entry['treatments'].extend(t for t in treatments if t not in entry['treatments'])
+            for alias in disease_aliases(name):
+                owners = alias_owners.setdefault(alias, [])
+                if name not in owners:
+                    owners.append(name)
+
+        # An alias shared by different diseases ('jaundice') is ambiguous and not
+        # used; 'Flu (Influenza)' and 'Influenza (Flu)' are the same disease
+        self.aliases = {}
+        for alias, owners in alias_owners.items():
+            if len({disease_identity(owner) for owner in owners}) == 1:
+                self.aliases[alias] = owners[0]
+        for name in self.entries:
+            self.aliases.setdefault(disease_aliases(name)[0], name)
+        self.matcher = SymptomMatcher(self.aliases)
+        self._longest_alias = max((len(alias.split()) for alias in self.aliases), default=0)
+
+    @classmethod
+    def build(cls, version):
+        if not Disease.objects.exists():
+            return cls.from_catalogue(version, os.path.join(settings.BASE_DIR, 'data', 'diseases.csv'))
+
+        symptoms = {}
+        for disease_id, symptom_name in Disease.symptoms.through.objects.values_list('disease_id', 'symptom__name'):
+            symptoms.setdefault(disease_id, []).append(symptom_name)
+        treatments = {}
+        for disease_id, medicine_name in Medicine.objects.order_by('id').values_list('disease_id', 'name'):
+            treatments.setdefault(disease_id, []).append(medicine_name)
+
+        entries = [
+            (name, symptoms.get(disease_id, []), treatments.get(disease_id, []), severity, specialist)
+            for disease_id, name, severity, specialist in Disease.objects.order_by('id').values_list(
+                'id', 'name', 'severity', 'consult_specialist'
+            )
+        ]
+        return cls(version, entries)
+
+    @classmethod
+    def from_catalogue(cls, version, path):
+        if not os.path.exists(path):
+            return cls(version, [])
+        return cls(version, (
+            (row.disease, row.symptoms, row.treatments, '', '') for row in iter_catalogue(path)
+        ))
+
+    def match(self, question):
+        """(entry, intents) for a single-disease question, or None."""
+        words = _WORD.findall(question.lower())
+        intents = set()
+
+        def strip(word):
+            if word in SYMPTOM_WORDS:
+                intents.add('symptoms')
+            elif word in TREATMENT_WORDS:
+                intents.add('treatment')
+            elif word in OVERVIEW_WORDS:
+                intents.add('overview')
+            elif word not in FILLER_WORDS:
+                return False
+            return True
+
+        start, end = 0, len(words)
+        while start < end and strip(words[start]):
+            start += 1
+        # Only intent words come after the name; 'a' in 'hepatitis a' must stay
+        while end > start and (
+            words[end - 1] in TRAILING_WORDS or words[end - 1] not in FILLER_WORDS and strip(words[end - 1])
+        ):
+            end -= 1
+        # 'what is X' / 'what are X' with nothing else is an overview question
+        if not intents and start >= 2 and words[0] in {'what', 'whats'}:
+            intents.add('overview')
+        if not intents or start == end:
+            return None
+
+        # Filler stripped before the name may belong to it ('common cold'): retry with it
+        for name_start in range(start, -1, -1):
+            if name_start < start and words[name_start] not in FILLER_WORDS:
+                break
+            text = normalize_symptom(' '.join(words[name_start:end]))
+            match = self.matcher.best_match(text, DISEASE_MATCH_THRESHOLD)
+            if match is not None and (match[1] == 1.0 or _close_enough(text, match[0])):
+                return self.entries[self.aliases[match[0]]], intents
+        return None
+
+    def mentioned_disease(self, question):
+        """Name of the disease whose name or alias appears in the question (longest wins), or None."""
+        words = normalize_symptom(' '.join(_WORD.findall(question.lower()))).split()
+        for size in range(min(self._longest_alias, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                name = self.aliases.get(' '.join(words[start:start + size]))
+                if name is not None:
+                    return name
+        return None
+
+    def entities(self, question):
+        """
+        (disease, key terms) of a question, for telling apart questions that
+        embed almost identically: the disease it names, if any, and every word
+        that is not filler or part of that disease's name. Intent words count
+        by kind, so 'symptoms of flu' and 'signs of flu' agree while 'treatment
+        of flu' does not; numbers ('type 2') and negations ('not') are kept.
+        """
+        disease = self.mentioned_disease(question)
+        name_words = set()
+        if disease is not None:
+            name_words = {word for alias in disease_aliases(disease) for word in alias.split()}
+        terms = set()
+        for word in normalize_symptom(' '.join(_WORD.findall(question.lower()))).split():
+            if word in SYMPTOM_WORDS:
+                terms.add('symptoms')
+            elif word in TREATMENT_WORDS:
+                terms.add('treatment')
+            elif word in OVERVIEW_WORDS:
+                terms.add('overview')
+            elif word not in FILLER_WORDS and word not in TRAILING_WORDS and word not in name_words:
+                terms.add(word)
+        return disease, frozenset(terms)
+
+    def answer(self, question):
+        """Templated answer for a single-disease question, or None to fall back to RAG."""
+        matched = self.match(question)
+        if matched is None:
+            return None
+        entry, intents = matched
+        lines = [f"**{entry['name']}**"]
+        if intents & {'symptoms', 'overview'} and entry['symptoms']:
+            lines.append(f"Common symptoms: {', '.join(entry['symptoms'])}.")
+        if intents & {'treatment', 'overview'} and entry['treatments']:
+            lines.append(f"Usual treatment: {', '.join(entry['treatments'])}.")
+        if len(lines) == 1:
+            # The catalogue doesn't have what was asked for
+            return None
+        # Only what someone curated: imported rows carry the field defaults
+        if entry['severity'] and entry['severity'] != UNCURATED_SEVERITY:
+            lines.append(f"Typical severity: {entry['severity']}.")
+        if entry['specialist'].strip():
+            lines.append(f"Specialist to consult: {entry['specialist']}.")
+        lines.append(DISCLAIMER)
+        return "\n".join(lines)
+
+
+_lookup = None
+_lookup_lock = threading.Lock()
+
+
+def _ensure_lookup(version):
+    global _lookup
+    with _lookup_lock:
+        if _lookup is None or _lookup.version != version:
+            _lookup = DiseaseLookup.build(version)
+        return _lookup
+
+
+def get_disease_lookup():
+    version = get_catalogue_version()
+    lookup = _lookup
+    if lookup is not None and lookup.version == version:
+        return lookup
+    return _ensure_lookup(version)
+
+
+async def aget_disease_lookup():
+    version = await aget_catalogue_version()
+    lookup = _lookup
+    if lookup is not None and lookup.version == version:
+        return lookup
+    return await sync_to_async(_ensure_lookup)(version)
@@ -0,0 +1,209 @@
+"""
+Batched, concurrent embedding for build_vector_db.
+
+BatchEmbedder sends chunks to any LangChain Embeddings backend in batches
+over a bounded thread pool. Rate-limit errors (HTTP 429 / RESOURCE_EXHAUSTED)
+halve the allowed concurrency and pause every worker with jittered
+exponential backoff; concurrency creeps back up as batches succeed. Finished
+vectors are appended to a checkpoint file so an interrupted build resumes
+where it stopped instead of paying for the same embeddings again.
+"""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def is_rate_limited(exc):
+    text = str(exc)
+    return '429' in text or 'RESOURCE_EXHAUSTED' in text or 'rate limit' in text.lower()
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on rate limiting and grows back on success."""
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.resume_at = 0.0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                pause = self.resume_at - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self.active < self.limit:
+                    self.active += 1
+                    return
+                else:
+                    self._cond.wait()
+
+    def release(self, ok=True):
+        with self._cond:
+            self.active -= 1
+            if ok:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def throttle(self, delay):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self.resume_at = max(self.resume_at, time.monotonic() + delay)
+            self._cond.notify_all()
+
+
+class EmbeddingCheckpoint:
+    """
+    Append-only JSON-lines file of finished vectors keyed by chunk hash.
+    The first line records the embedding backend id; a checkpoint written
+    by a different backend is discarded. A torn final line (crash mid-write) is
+    ignored and cut off before new records are appended.
+
+    Only vectors left over from an interrupted run are held in memory
+    (`vectors`, consumed as they are reused); new ones go straight to disk.
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self.vectors = {}
+        # Byte length of the complete lines; a torn tail is cut off before appending
+        self._valid_size = 0
+        self._load()
+        self.count = len(self.vectors)
+        self._file = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            try:
+                if json.loads(header).get('model') != self.model:
+                    return
+            except ValueError:
+                return
+            valid_size = len(header)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.vectors[record['id']] = record['vector']
+                valid_size += len(line)
+            self._valid_size = valid_size
+
+    def _open(self):
+        if self._file is None:
+            fresh = not self.count
+            if not fresh:
+                # New records must start on a line of their own
+                os.truncate(self.path, self._valid_size)
+            self._file = open(self.path, 'w' if fresh else 'a', encoding='utf-8')
+            if fresh:
+                self._file.write(json.dumps({'model': self.model}) + '\n')
+        return self._file
+
+    def add(self, ids, vectors):
+        f = self._open()
+        for chunk_id, vector in zip(ids, vectors):
+            f.write(json.dumps({'id': chunk_id, 'vector': vector}) + '\n')
+        f.flush()
+        self.count += len(ids)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        self.close()
+        self.vectors = {}
+        self.count = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BatchEmbedder:
+    def __init__(self, embeddings, batch_size=64, max_workers=4, max_retries=8,
+                 base_delay=1.0, max_delay=60.0, checkpoint=None, log=None):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.checkpoint = checkpoint
+        self.log = log or (lambda message: None)
+        self.limiter = AdaptiveLimiter(max_workers)
+        self.rate_limited = 0
+
+    def _embed_batch(self, texts):
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                self.limiter.release(ok=False)
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                self.rate_limited += 1
+                self.log(f"Rate limited, backing off {delay:.1f}s (concurrency {max(1, self.limiter.limit // 2)})")
+                self.limiter.throttle(delay)
+                attempt += 1
+                continue
+            self.limiter.release(ok=True)
+            return vectors
+
+    def embed(self, ids, texts):
+        """Return {id: vector} for every id, embedding only those not already checkpointed."""
+        done = self.checkpoint.vectors if self.checkpoint is not None else {}
+        pending = [(i, t) for i, t in zip(ids, texts) if i not in done]
+        results = {i: done.pop(i) for i in ids if i in done}
+        if results:
+            self.log(f"Resuming: {len(results)} embeddings reused from checkpoint, {len(pending)} to go")
+
+        batches = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._embed_batch, [t for _, t in batch]): batch for batch in batches}
+            not_done = set(futures)
+            while not_done:
+                finished, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future.cancelled():
+                        continue
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+                    batch_ids = [i for i, _ in futures[future]]
+                    vectors = future.result()
+                    if self.checkpoint is not None:
+                        self.checkpoint.add(batch_ids, vectors)
+                    results.update(zip(batch_ids, vectors))
+                if error is not None:
+                    # Stop queued batches; the ones already running still get checkpointed
+                    for future in not_done:
+                        future.cancel()
+                else:
+                    self.log(f"Embedded {len(results)}/{len(ids)} chunks")
+
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        if error is not None:
+            raise error
+        return results
@@ -0,0 +1,244 @@
+"""
+Embedding backends for the chatbot vector store.
+
+settings.EMBEDDING_BACKEND picks the implementation used by both
+build_vector_db and DocTalkChatbot:
+
+- 'google':  GoogleGenerativeAIEmbeddings (remote, needs GOOGLE_API_KEY)
+- 'hashing': HashingEmbeddings, fully local signed feature hashing of word
+             and character n-grams computed with NumPy. No network, no
+             model download; good enough for CI, benchmarks and air-gapped
+             deployments.
+- 'fake':    HashingEmbeddings with a simulated per-call latency, so
+             offline benchmarks see realistic embedding round trips.
+
+Every backend has an identifier (embedding_backend_id()) that is recorded in
+the vector store manifest, so an index is never queried with vectors from a
+different embedding space.
+
+get_embeddings() returns every backend wrapped in UnitEmbeddings, so stored
+and query vectors are unit length whatever the provider returns: the
+retriever turns FAISS's squared L2 distance into cosine similarity with
+1 - d/2, which only holds for unit vectors. The manifest records this as
+'unit_vectors'.
+
+CachedQueryEmbeddings wraps a backend for the chat retrieval path so
+repeated questions skip the embedding call.
+"""
+import hashlib
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from langchain_core.embeddings import Embeddings
+
+from .metrics import timed
+
+_WORDS = re.compile(r'\w+')
+_SPACES = re.compile(r'\s+')
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dim=384, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    @property
+    def identifier(self):
+        return f"hashing:dim={self.dim}:ngrams={self.ngram_range[0]}-{self.ngram_range[1]}"
+
+    def _features(self, text):
+        words = _WORDS.findall(text.lower())
+        features = list(words)
+        features.extend(f'{a} {b}' for a, b in zip(words, words[1:]))
+        low, high = self.ngram_range
+        for word in words:
+            padded = f'<{word}>'
+            for n in range(low, high + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def _embed(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(f.encode('utf-8')) for f in self._features(text)), dtype=np.uint32
+        )
+        vector = np.zeros(self.dim, dtype=np.float64)
+        if len(hashes):
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+            np.add.at(vector, hashes % self.dim, signs)
+            # Sublinear term frequency, then unit length
+            vector = np.sign(vector) * np.log1p(np.abs(vector))
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class FakeEmbeddings(HashingEmbeddings):
+    """
+    Hashing vectors behind a simulated network round trip: each call (one
+    query, or one batch of documents) sleeps `latency` seconds first. Used by
+    the benchmark command; stores built with it are interchangeable with
+    'hashing' ones.
+    """
+
+    def __init__(self, dim=384, latency=0.0):
+        super().__init__(dim)
+        self.latency = latency
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class UnitEmbeddings(Embeddings):
+    """Scales every vector of `inner` to unit length (zero vectors are left as they are)."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    @staticmethod
+    def _unit(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1)).tolist()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._unit(self.inner.embed_documents(texts))
+
+    def embed_query(self, text):
+        return self._unit(self.inner.embed_query(text))
+
+
+def embedding_backend_id():
+    backend = settings.EMBEDDING_BACKEND
+    if backend == 'google':
+        return f"google:{settings.GOOGLE_EMBEDDING_MODEL}"
+    if backend in ('hashing', 'fake'):
+        return HashingEmbeddings(dim=settings.HASHING_EMBEDDING_DIM).identifier
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'")
+
+
+def get_embeddings(api_key=None):
+    return UnitEmbeddings(_backend_embeddings(api_key))
+
+
+def _backend_embeddings(api_key):
+    backend = settings.EMBEDDING_BACKEND
+    if backend == 'google':
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        kwargs = {'google_api_key': api_key} if api_key else {}
+        return GoogleGenerativeAIEmbeddings(model=settings.GOOGLE_EMBEDDING_MODEL, **kwargs)
+    if backend == 'hashing':
+        return HashingEmbeddings(dim=settings.HASHING_EMBEDDING_DIM)
+    if backend == 'fake':
+        return FakeEmbeddings(dim=settings.HASHING_EMBEDDING_DIM, latency=settings.FAKE_EMBEDDING_LATENCY)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'")
+
+
+def normalize_query(text):
+    return _SPACES.sub(' ', text).strip().lower()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Two-level cache for query embeddings: an in-process LRU, then an optional
+    shared/on-disk Django cache alias. Keys combine the normalised query text
+    with the backend id, so switching backends never serves stale vectors.
+    Document embedding is passed straight through.
+    """
+
+    def __init__(self, inner, backend_id, max_size=1024, shared_alias=None):
+        self.inner = inner
+        self.backend_id = backend_id
+        self.max_size = max_size
+        self.shared_alias = shared_alias
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, text):
+        digest = hashlib.sha1(normalize_query(text).encode('utf-8')).hexdigest()
+        # 'unit': entries cached before vectors were normalised are never served
+        return f'query-embedding:unit:{self.backend_id}:{digest}'
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def embed_query(self, text):
+        with timed('embed'):
+            return self._embed_query(text)
+
+    def _embed_query(self, text):
+        key = self._key(text)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.local_hits += 1
+                return vector
+
+        shared = caches[self.shared_alias] if self.shared_alias else None
+        if shared is not None:
+            vector = shared.get(key)
+            if vector is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._remember(key, vector)
+                return vector
+
+        vector = self.inner.embed_query(text)
+        with self._lock:
+            self.misses += 1
+        self._remember(key, vector)
+        if shared is not None:
+            shared.set(key, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def stats(self):
+        with self._lock:
+            total = self.local_hits + self.shared_hits + self.misses
+            return {
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.local_hits + self.shared_hits) / total, 4) if total else 0.0,
+                'size': len(self._lru),
+            }
+
+
+def get_query_embeddings(api_key=None):
+    """Backend from settings wrapped in the query-embedding cache, for retrieval."""
+    return CachedQueryEmbeddings(
+        get_embeddings(api_key),
+        embedding_backend_id(),
+        max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+        shared_alias=settings.QUERY_EMBEDDING_CACHE_ALIAS,
+    )
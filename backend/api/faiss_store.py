@@ -0,0 +1,174 @@
+"""
+On-disk layout of the chatbot vector store that can be shared between worker
+processes.
+
+Instead of FAISS.save_local's pickled docstore, build_vector_db writes:
+
+- index.faiss          the served FAISS index, opened read-only with mmap IO flags
+- index.exact.faiss    the exact vectors, when the served index is approximate
+                       or compressed (build-time only, never loaded by workers)
+- chunks.jsonl         one JSON record per vector row: {"id", "text", "metadata"}
+- chunks.offsets.npy   int64 byte offsets of each record (n + 1 entries)
+
+Serving processes mmap all three, so every gunicorn worker shares one copy in
+the page cache and startup deserialises no Python objects; a chunk is only
+decoded when it is returned by a search. Files are replaced with os.replace,
+so workers that still map the previous build keep reading valid data.
+
+Stores written by older builds (index.pkl) are still loaded through
+FAISS.load_local until the next build rewrites them.
+"""
+import json
+import mmap
+import os
+from collections.abc import Mapping
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+INDEX_NAME = 'index.faiss'
+EXACT_INDEX_NAME = 'index.exact.faiss'
+CHUNKS_NAME = 'chunks.jsonl'
+OFFSETS_NAME = 'chunks.offsets.npy'
+LEGACY_DOCSTORE_NAME = 'index.pkl'
+
+# Maps the codes of flat, scalar-quantised and HNSW indexes and the inverted lists
+# of IVF ones (IO_FLAG_MMAP alone only covers IVF, and the two don't combine for it)
+MMAP_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+class ChunkFile:
+    """Read-only, memory-mapped view of chunks.jsonl by row number."""
+
+    def __init__(self, db_path):
+        self.offsets = np.load(os.path.join(db_path, OFFSETS_NAME), mmap_mode='r')
+        with open(os.path.join(db_path, CHUNKS_NAME), 'rb') as f:
+            # mmap keeps its own reference to the file; an empty file cannot be mapped
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def record(self, row):
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._data[start:end])
+
+
+class MmapDocstore(Docstore):
+    """Docstore keyed by vector row number, decoding chunks on demand."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def search(self, search):
+        if not isinstance(search, (int, np.integer)) or not 0 <= search < len(self.chunks):
+            return f"ID {search} not found."
+        record = self.chunks.record(search)
+        return Document(id=record['id'], page_content=record['text'], metadata=record['metadata'])
+
+
+class _RowIds(Mapping):
+    """index_to_docstore_id for MmapDocstore: row i maps to docstore key i, without a dict."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.size:
+            raise KeyError(row)
+        return int(row)
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self):
+        return self.size
+
+
+def save_vector_store(db_path, db, served_index=None):
+    """
+    Write a FAISS vector store in the mmap-able layout (manifest not included).
+    served_index, built from db.index with ann_index.build_index and in the
+    same row order, is what workers search; db.index is then kept as the
+    exact copy for the next incremental build.
+    """
+    offsets = [0]
+    tmp_chunks = os.path.join(db_path, CHUNKS_NAME + '.tmp')
+    with open(tmp_chunks, 'wb') as f:
+        for row in range(db.index.ntotal):
+            doc_id = db.index_to_docstore_id[row]
+            doc = db.docstore.search(doc_id)
+            line = json.dumps(
+                {'id': doc_id, 'text': doc.page_content, 'metadata': doc.metadata},
+                ensure_ascii=False,
+                default=str,
+            ).encode('utf-8') + b'\n'
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+
+    tmp_offsets = os.path.join(db_path, OFFSETS_NAME + '.tmp')
+    with open(tmp_offsets, 'wb') as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64))
+
+    exact_path = os.path.join(db_path, EXACT_INDEX_NAME)
+    if served_index is not None:
+        faiss.write_index(db.index, exact_path + '.tmp')
+        os.replace(exact_path + '.tmp', exact_path)
+
+    tmp_index = os.path.join(db_path, INDEX_NAME + '.tmp')
+    faiss.write_index(served_index if served_index is not None else db.index, tmp_index)
+
+    # Atomic renames: workers that mapped the previous files keep their inodes
+    os.replace(tmp_chunks, os.path.join(db_path, CHUNKS_NAME))
+    os.replace(tmp_offsets, os.path.join(db_path, OFFSETS_NAME))
+    os.replace(tmp_index, os.path.join(db_path, INDEX_NAME))
+    stale = [os.path.join(db_path, LEGACY_DOCSTORE_NAME)]
+    if served_index is None:
+        stale.append(exact_path)
+    for path in stale:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def is_legacy_layout(db_path):
+    return not os.path.exists(os.path.join(db_path, CHUNKS_NAME))
+
+
+def load_vector_store(db_path, embeddings, mmap_index=True):
+    """
+    Open the vector store. With mmap_index (serving) the index and chunks are
+    mapped read-only; without it (building) everything is loaded into memory
+    so it can be modified and saved again.
+    """
+    if is_legacy_layout(db_path):
+        return FAISS.load_local(db_path, embeddings, allow_dangerous_deserialization=True)
+
+    chunks = ChunkFile(db_path)
+    if mmap_index:
+        index = faiss.read_index(os.path.join(db_path, INDEX_NAME), MMAP_FLAGS)
+    else:
+        # Builds add to and delete from the exact vectors, never the approximate index
+        index_path = os.path.join(db_path, EXACT_INDEX_NAME)
+        if not os.path.exists(index_path):
+            index_path = os.path.join(db_path, INDEX_NAME)
+        index = faiss.read_index(index_path)
+    if index.ntotal != len(chunks):
+        raise ValueError(
+            f"Vector store is inconsistent ({index.ntotal} vectors, {len(chunks)} chunks); "
+            f"it is probably being rebuilt"
+        )
+
+    if mmap_index:
+        return FAISS(embeddings, index, MmapDocstore(chunks), _RowIds(len(chunks)))
+
+    docs = {}
+    index_to_docstore_id = {}
+    for row in range(len(chunks)):
+        record = chunks.record(row)
+        docs[record['id']] = Document(id=record['id'], page_content=record['text'], metadata=record['metadata'])
+        index_to_docstore_id[row] = record['id']
+    return FAISS(embeddings, index, InMemoryDocstore(docs), index_to_docstore_id)
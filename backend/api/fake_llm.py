@@ -0,0 +1,52 @@
+"""
+Offline stand-in for Gemini (settings.LLM_BACKEND = 'fake').
+
+Every call waits `latency` seconds, like a remote round trip, and answers
+with the same canned text; streamed calls wait once and then yield the text
+word by word. The async methods sleep with asyncio so concurrent requests
+overlap the way real network calls do. Used by the benchmark command.
+"""
+import asyncio
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FAKE_ANSWER = (
+    "This is a simulated answer from the offline model. Rest, stay hydrated and "
+    "consult a doctor if your symptoms get worse or do not improve."
+)
+
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.5
+    answer: str = FAKE_ANSWER
+
+    @property
+    def _llm_type(self):
+        return "doctalk-fake"
+
+    def _result(self):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+    def _chunks(self):
+        for i, word in enumerate(self.answer.split(' ')):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        yield from self._chunks()
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks():
+            yield chunk
@@ -0,0 +1,113 @@
+"""
+Streaming document ingestion for build_vector_db.
+
+Files are loaded page by page and split in worker processes, one file per
+task, with at most `workers` files in flight. A task returns the chunk list
+of its whole file, so peak memory is bounded by the `workers` largest files
+(their text plus chunk overlap), not by the size of the corpus, and not by
+build_vector_db's --window, which only bounds what is buffered for embedding.
+A single very large PDF is held in full; lower --load-workers for those.
+
+CSV files are ingested row by row rather than through the character
+splitter: every row becomes exactly one chunk, so a disease never ends up
+split across chunks or glued to its neighbours by the overlap. Rows of the
+disease catalogue (disease,symptoms,treatment) are parsed with the tolerant
+catalogue reader and carry the disease name as metadata, which the chatbot's
+retriever filters on. PDFs keep character splitting.
+
+Nothing here touches Django, so the worker processes stay light.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from langchain_community.document_loaders import CSVLoader, PyPDFLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .disease_catalogue import parse_catalogue_line
+from .vector_store import chunk_hash
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+LOADERS = {
+    '.pdf': PyPDFLoader,
+    '.csv': CSVLoader,
+}
+
+
+def list_corpus_files(data_path):
+    return sorted(
+        os.path.join(data_path, name)
+        for name in os.listdir(data_path)
+        if os.path.splitext(name)[1].lower() in LOADERS
+    )
+
+
+CATALOGUE_HEADER = 'disease,symptoms,treatment'
+
+
+def iter_csv_rows(path):
+    """One Document per CSV row; catalogue rows get a 'disease' metadata field."""
+    with open(path, encoding='utf-8') as f:
+        header = f.readline().strip().lower()
+        if header != CATALOGUE_HEADER:
+            yield from CSVLoader(path).lazy_load()
+            return
+        for row_number, line in enumerate(f):
+            row = parse_catalogue_line(line)
+            if row is None:
+                continue
+            text = (
+                f"disease: {row.disease}\n"
+                f"symptoms: {', '.join(row.symptoms)}\n"
+                f"treatment: {', '.join(row.treatments)}"
+            )
+            yield Document(page_content=text, metadata={'source': path, 'row': row_number, 'disease': row.disease})
+
+
+def load_file_chunks(path, csv_rows=True):
+    """
+    Load one file and chunk it; returns [(hash, text, metadata), ...]. PDFs
+    are split page by page; CSVs give one chunk per row unless csv_rows is
+    False, in which case they go through the splitter like everything else.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv' and csv_rows:
+        return [(chunk_hash(doc), doc.page_content, doc.metadata) for doc in iter_csv_rows(path)]
+
+    loader = LOADERS[extension](path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = []
+    for page in loader.lazy_load():
+        for chunk in splitter.split_documents([page]):
+            chunks.append((chunk_hash(chunk), chunk.page_content, chunk.metadata))
+    return chunks
+
+
+def iter_corpus_chunks(paths, workers=1, csv_rows=True):
+    """
+    Yield (path, chunks, error) per file as files finish loading. With
+    workers > 1 files are loaded in a process pool, at most `workers` at a time.
+    """
+    if workers <= 1:
+        for path in paths:
+            try:
+                yield path, load_file_chunks(path, csv_rows), None
+            except Exception as e:
+                yield path, [], e
+        return
+
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(load_file_chunks, path, csv_rows): path for path in islice(paths, workers)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending[pool.submit(load_file_chunks, next_path, csv_rows)] = next_path
+                error = future.exception()
+                yield path, [] if error else future.result(), error
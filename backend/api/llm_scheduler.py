@@ -0,0 +1,411 @@
+"""
+Scheduler in front of every Gemini call made by DocTalkChatbot.
+
+- Singleflight: identical questions already being answered share the
+  in-flight call instead of making their own.
+- Concurrency cap with a priority queue: at most max_concurrency calls run
+  at once; waiters are admitted by priority (INTERACTIVE before BACKGROUND),
+  then arrival order, and give up after max_wait seconds.
+- Token bucket: calls are spaced to rate_per_minute (with a burst allowance)
+  so we stay under the provider quota instead of hitting 429s.
+- Circuit breaker: after failure_threshold consecutive rate-limit errors the
+  circuit opens and calls fail fast for cooldown seconds; one trial call is
+  then let through, closing the circuit again if it succeeds. Rate-limited
+  calls are retried with backoff while the circuit is closed.
+
+Sync (get_response) and async (aget_response / astream_response) callers
+share the same state: waiting is done on concurrent.futures.Future objects,
+which async callers await through asyncio.wrap_future.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+
+from .embedding_pipeline import is_rate_limited
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+
+class LLMUnavailableError(Exception):
+    """The call was not attempted; tell the user to try again shortly."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+class QueueTimeoutError(LLMUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=3, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def release_trial(self):
+        """The call ended without an outcome (cancelled, client gone): let another call be the trial."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+
+    def record_failure(self, rate_limited):
+        with self._lock:
+            self._trial_running = False
+            if not rate_limited:
+                # Only throttling counts; another call may try again
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute // 10))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token (possibly going into debt); returns how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency=4,
+        rate_per_minute=0,
+        burst=None,
+        failure_threshold=3,
+        cooldown=30.0,
+        max_wait=30.0,
+        max_retries=2,
+        base_delay=1.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, Future)
+        self._seq = itertools.count()
+        self._inflight = {}  # singleflight key -> Future of the shared result
+
+        self.calls = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.peak_queue_depth = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    # -- concurrency slots --------------------------------------------------
+
+    def _request_slot(self, priority):
+        """None if a slot was granted immediately, else a Future resolved when it is."""
+        with self._lock:
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                return None
+            waiter = Future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+            return waiter
+
+    def _release_slot(self):
+        with self._lock:
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                # Hand the slot over directly; skip waiters that gave up
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    return
+            self._active -= 1
+
+    def _record_wait(self, started):
+        waited = time.monotonic() - started
+        with self._lock:
+            self.waited += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _gave_up(self, waiter):
+        """After a timeout/cancellation: True if the wait was withdrawn, False if the slot arrived anyway."""
+        if waiter.cancel() or waiter.cancelled():
+            with self._lock:
+                if waiter in (entry[2] for entry in self._waiters):
+                    self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+                    heapq.heapify(self._waiters)
+            return True
+        return False
+
+    def _acquire(self, priority):
+        started = time.monotonic()
+        waiter = self._request_slot(priority)
+        if waiter is not None:
+            try:
+                waiter.result(timeout=self.max_wait)
+            except FutureTimeoutError:
+                if self._gave_up(waiter):
+                    with self._lock:
+                        self.timeouts += 1
+                    raise QueueTimeoutError("Timed out waiting for an LLM slot")
+        self._record_wait(started)
+
+    async def _aacquire(self, priority):
+        started = time.monotonic()
+        waiter = self._request_slot(priority)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(waiter)), self.max_wait)
+            except asyncio.TimeoutError:
+                if self._gave_up(waiter):
+                    with self._lock:
+                        self.timeouts += 1
+                    raise QueueTimeoutError("Timed out waiting for an LLM slot")
+            except asyncio.CancelledError:
+                if not self._gave_up(waiter):
+                    self._release_slot()
+                raise
+        self._record_wait(started)
+
+    # -- calls ----------------------------------------------------------------
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError("LLM provider is throttling; failing fast")
+
+    def _on_error(self, exc, attempt):
+        """Record a failed attempt; returns the backoff delay if it should be retried, else None."""
+        limited = is_rate_limited(exc)
+        self.breaker.record_failure(limited)
+        if not limited:
+            return None
+        with self._lock:
+            self.rate_limited += 1
+        if attempt >= self.max_retries or self.breaker.state != CircuitBreaker.CLOSED:
+            return None
+        return self.base_delay * 2 ** attempt
+
+    def _run(self, fn, priority):
+        self._acquire(priority)
+        try:
+            for attempt in itertools.count():
+                self._check_circuit()
+                try:
+                    time.sleep(self.bucket.reserve())
+                    with self._lock:
+                        self.calls += 1
+                    result = fn()
+                except Exception as e:
+                    delay = self._on_error(e, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+                except BaseException:
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            self._release_slot()
+
+    async def _arun(self, afn, priority):
+        await self._aacquire(priority)
+        try:
+            for attempt in itertools.count():
+                self._check_circuit()
+                try:
+                    await asyncio.sleep(self.bucket.reserve())
+                    with self._lock:
+                        self.calls += 1
+                    result = await afn()
+                except Exception as e:
+                    delay = self._on_error(e, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    # Cancelled: no outcome to record, but the trial slot must not stay taken
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            self._release_slot()
+
+    def _join_flight(self, key):
+        """(future, is_leader) for a singleflight key."""
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is not None:
+                self.coalesced += 1
+                return shared, False
+            shared = self._inflight[key] = Future()
+            return shared, True
+
+    def _land_flight(self, key, shared, result=None, exc=None):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if shared.done():
+            # Followers only ever wait on it through a shield; never fail the leader here
+            return
+        if exc is not None:
+            if not isinstance(exc, Exception):
+                # The leader was cancelled (client went away); followers just retry later
+                exc = LLMUnavailableError("Shared LLM call was cancelled")
+            shared.set_exception(exc)
+        else:
+            shared.set_result(result)
+
+    def call(self, fn, key=None, priority=INTERACTIVE):
+        """Run fn() (a blocking LLM call) under the scheduler; same-key callers share one call."""
+        if key is None:
+            return self._run(fn, priority)
+        shared, leader = self._join_flight(key)
+        if not leader:
+            return shared.result()
+        try:
+            result = self._run(fn, priority)
+        except BaseException as e:
+            self._land_flight(key, shared, exc=e)
+            raise
+        self._land_flight(key, shared, result)
+        return result
+
+    async def acall(self, afn, key=None, priority=INTERACTIVE):
+        """Async call(): afn is a coroutine function, e.g. lambda: chain.ainvoke(query)."""
+        if key is None:
+            return await self._arun(afn, priority)
+        shared, leader = self._join_flight(key)
+        if not leader:
+            # Shielded: a cancelled follower (client gone) must not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(shared))
+        try:
+            result = await self._arun(afn, priority)
+        except BaseException as e:
+            self._land_flight(key, shared, exc=e)
+            raise
+        self._land_flight(key, shared, result)
+        return result
+
+    @asynccontextmanager
+    async def aslot(self, priority=INTERACTIVE):
+        """
+        Slot, rate limit and circuit check for a streamed call, held for the
+        whole stream. Streams are not coalesced or retried (tokens may
+        already have been sent); a rate-limit error still counts towards the
+        circuit breaker.
+        """
+        await self._aacquire(priority)
+        try:
+            self._check_circuit()
+            try:
+                await asyncio.sleep(self.bucket.reserve())
+                with self._lock:
+                    self.calls += 1
+                yield
+            except Exception as e:
+                self._on_error(e, self.max_retries)
+                raise
+            except BaseException:
+                # Stream closed early (GeneratorExit) or cancelled
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+        finally:
+            self._release_slot()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self._active,
+                'queue_depth': len(self._waiters),
+                'peak_queue_depth': self.peak_queue_depth,
+                'inflight_keys': len(self._inflight),
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'rejected_circuit_open': self.rejected,
+                'queue_timeouts': self.timeouts,
+                'rate_limited': self.rate_limited,
+                'circuit_state': self.breaker.state,
+                'circuit_opens': self.breaker.opens,
+                'avg_wait_ms': round(self.wait_seconds / self.waited * 1000, 3) if self.waited else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                    rate_per_minute=settings.LLM_RATE_PER_MINUTE,
+                    burst=settings.LLM_RATE_BURST,
+                    failure_threshold=settings.LLM_CIRCUIT_FAILURES,
+                    cooldown=settings.LLM_CIRCUIT_COOLDOWN,
+                    max_wait=settings.LLM_QUEUE_TIMEOUT,
+                )
+    return _scheduler
@@ -0,0 +1,148 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks import (
+    SUITES,
+    bench_build,
+    bench_http,
+    bench_retrieval,
+    bench_scoring,
+    compare,
+    environment,
+)
+
+FULL_SIZES = {'scoring': [10, 100, 1000, 10000, 100000], 'retrieval': [1000, 10000, 100000], 'build': [1000, 10000]}
+QUICK_SIZES = {'scoring': [10, 1000], 'retrieval': [1000], 'build': [500]}
+
+
+class Command(BaseCommand):
+    help = 'Runs the offline benchmark suites (fake Gemini and embeddings) and compares them with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--suite',
+            action='append',
+            choices=SUITES,
+            help='Suite to run; repeat for several (default: all)'
+        )
+        parser.add_argument('--quick', action='store_true', help='Small sizes and fewer requests, for a smoke run')
+        parser.add_argument('--scoring-sizes', type=int, nargs='+', help='Catalogue sizes (diseases) to score against')
+        parser.add_argument('--retrieval-sizes', type=int, nargs='+', help='Corpus sizes (vectors) to search')
+        parser.add_argument('--build-sizes', type=int, nargs='+', help='Catalogue rows embedded by build_vector_db')
+        parser.add_argument('--requests', type=int, help='Requests per HTTP endpoint (default 200, 50 with --quick)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent HTTP requests in flight')
+        parser.add_argument(
+            '--llm-latency',
+            type=float,
+            default=settings.FAKE_LLM_LATENCY,
+            help='Seconds per fake Gemini call'
+        )
+        parser.add_argument(
+            '--embedding-latency',
+            type=float,
+            default=settings.FAKE_EMBEDDING_LATENCY,
+            help='Seconds per fake embedding call (one query or one batch)'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic data')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.1,
+            help='Relative change counted as a regression (0.1 = 10%% worse)'
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error if any metric regressed beyond the tolerance'
+        )
+
+    def handle(self, *args, **options):
+        suites = options['suite'] or list(SUITES)
+        sizes = QUICK_SIZES if options['quick'] else FULL_SIZES
+        for suite in ('scoring', 'retrieval', 'build'):
+            sizes = {**sizes, suite: options[f'{suite}_sizes'] or sizes[suite]}
+        requests = options['requests'] or (50 if options['quick'] else 200)
+        run_options = {
+            'suites': suites,
+            'sizes': sizes,
+            'requests': requests,
+            'concurrency': options['concurrency'],
+            'llm_latency': options['llm_latency'],
+            'embedding_latency': options['embedding_latency'],
+            'seed': options['seed'],
+        }
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        results = {}
+        # Synthetic catalogues and doctors go into a throwaway test database, never the real one
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory(prefix='doctalk-bench-') as base_dir:
+                for suite in suites:
+                    self.stdout.write(f"Running {suite}...")
+                    if suite == 'scoring':
+                        suite_results = bench_scoring(sizes['scoring'], seed=options['seed'])
+                    elif suite == 'retrieval':
+                        suite_results = bench_retrieval(sizes['retrieval'], seed=options['seed'])
+                    elif suite == 'build':
+                        suite_results = bench_build(
+                            sizes['build'], base_dir, options['embedding_latency'], seed=options['seed']
+                        )
+                    else:
+                        suite_results = bench_http(
+                            f'{base_dir}/http',
+                            requests=requests,
+                            concurrency=options['concurrency'],
+                            llm_latency=options['llm_latency'],
+                            embedding_latency=options['embedding_latency'],
+                            seed=options['seed'],
+                        )
+                    for case, metrics in suite_results.items():
+                        self.stdout.write(f"  {case}: {self._format(metrics)}")
+                    results.update(suite_results)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {'environment': environment(), 'options': run_options, 'results': results}
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['output']}"))
+
+        if baseline is not None:
+            self._report_comparison(report, baseline, options)
+
+    @staticmethod
+    def _format(metrics):
+        return ", ".join(f"{name}={value}" for name, value in metrics.items())
+
+    def _report_comparison(self, report, baseline, options):
+        if baseline.get('options') != report['options']:
+            self.stdout.write(self.style.WARNING("⚠️ Baseline was run with different options; numbers may not compare"))
+
+        rows = compare(report['results'], baseline.get('results', {}), options['tolerance'])
+        self.stdout.write(f"\n{'case':<32} {'metric':<20} {'baseline':>12} {'current':>12} {'change':>8}")
+        for case, metric, old, new, change, regressed in rows:
+            line = f"{case:<32} {metric:<20} {old:>12} {new:>12} {change:>+7.1%}"
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+
+        regressions = [row for row in rows if row[5]]
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"✅ No regressions beyond {options['tolerance']:.0%}"))
+        elif options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} metric(s) regressed beyond {options['tolerance']:.0%}")
+        else:
+            self.stdout.write(self.style.WARNING(f"⚠️ {len(regressions)} metric(s) regressed beyond {options['tolerance']:.0%}"))
@@ -1,18 +1,95 @@
 import os
+import uuid
+import faiss
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from langchain_community.document_loaders import PyPDFLoader, CSVLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
+from api.ann_index import (
+    COMPRESSIONS,
+    INDEX_TYPES,
+    apply_search_params,
+    build_index,
+    default_nlist,
+    factory_string,
+    recall_report,
+    search_param_grid,
+    training_sample,
+)
+from api.embedding_pipeline import BatchEmbedder, EmbeddingCheckpoint
+from api.embeddings import embedding_backend_id, get_embeddings
+from api.faiss_store import INDEX_NAME, is_legacy_layout, load_vector_store, save_vector_store
+from api.ingestion import iter_corpus_chunks, list_corpus_files
+from api.vector_store import load_manifest, save_manifest
+
+# What stores built before index options existed were
+FLAT_INDEX = {'factory': 'Flat', 'search_params': {}}
+
 
 class Command(BaseCommand):
     help = 'Builds the vector database for the chatbot'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the existing index and re-embed every chunk'
+        )
+        parser.add_argument('--batch-size', type=int, default=64, help='Chunks per embedding request')
+        parser.add_argument('--workers', type=int, default=4, help='Maximum concurrent embedding requests')
+        parser.add_argument('--max-retries', type=int, default=8, help='Retries per batch on rate-limit errors')
+        parser.add_argument(
+            '--load-workers',
+            type=int,
+            default=min(4, os.cpu_count() or 1),
+            help=(
+                'Processes used to load and split files in parallel. Each one holds the chunks of a whole '
+                'file, so peak memory grows with the largest files times this; lower it for very large PDFs'
+            )
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=1024,
+            help=(
+                'New chunks buffered before they are embedded and added to the index. Bounds embedding '
+                'and index memory only; loading is per file (see --load-workers)'
+            )
+        )
+        parser.add_argument(
+            '--csv-chunking',
+            choices=('rows', 'text'),
+            default='rows',
+            help='rows: one chunk per CSV row with disease metadata; text: character splitting like PDFs'
+        )
+
+        # Served index. Changing these rebuilds the index from the stored exact vectors, no re-embedding.
+        parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat', help='Index searched by the chatbot')
+        parser.add_argument(
+            '--compression',
+            choices=sorted(COMPRESSIONS),
+            default='none',
+            help='Scalar quantisation of the stored vectors (flat, ivf and hnsw)'
+        )
+        parser.add_argument('--nlist', type=int, help='IVF lists (default ~4*sqrt(chunks))')
+        parser.add_argument('--pq-m', type=int, default=0, help='IVF-PQ sub-quantisers; must divide the dimension')
+        parser.add_argument('--pq-bits', type=int, default=8, help='Bits per PQ sub-quantiser code')
+        parser.add_argument('--hnsw-m', type=int, default=32, help='HNSW neighbours per node')
+        parser.add_argument('--ef-construction', type=int, default=200, help='HNSW build-time search depth')
+        parser.add_argument('--train-size', type=int, default=50000, help='Vectors sampled to train IVF/PQ/int8')
+        parser.add_argument('--nprobe', type=int, default=16, help='IVF lists probed per query (saved)')
+        parser.add_argument('--ef-search', type=int, default=64, help='HNSW search depth (saved)')
+        parser.add_argument(
+            '--eval-queries',
+            type=int,
+            default=200,
+            help='Chunks used as queries for the recall@k vs latency report (0 to skip)'
+        )
+        parser.add_argument('--eval-k', type=int, default=3, help='k for the recall report')
+
     def handle(self, *args, **kwargs):
         load_dotenv()
-        
+
         # Paths
         BASE_DIR = settings.BASE_DIR
         DATA_PATH = os.path.join(BASE_DIR, 'data')
@@ -22,49 +99,180 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"Data directory not found at {DATA_PATH}"))
             return
 
-        self.stdout.write("Loading documents...")
-        documents = []
-        
-        # Check if data directory is empty
-        if not os.listdir(DATA_PATH):
+        paths = list_corpus_files(DATA_PATH)
+        if not paths:
              self.stdout.write(self.style.WARNING("No documents found in data/ directory. Vector store will be empty."))
 
-        for file in os.listdir(DATA_PATH):
-            path = os.path.join(DATA_PATH, file)
-            try:
-                if file.endswith(".pdf"):
-                    loader = PyPDFLoader(path)
-                    documents.extend(loader.load())
-                    self.stdout.write(f"Loaded PDF: {file}")
-                elif file.endswith(".csv"):
-                    loader = CSVLoader(path)
-                    documents.extend(loader.load())
-                    self.stdout.write(f"Loaded CSV: {file}")
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error loading {file}: {str(e)}"))
-
-        if not documents:
-            self.stdout.write(self.style.WARNING("No valid documents loaded. Aborting."))
+        backend_id = embedding_backend_id()
+        self.stdout.write(f"Embedding backend: {backend_id}")
+
+        try:
+            # Catch bad option combinations before spending anything on embeddings
+            factory_string(
+                kwargs['index_type'], kwargs['pq_m'] or 1, kwargs['compression'], 1, kwargs['pq_m'], kwargs['pq_bits']
+            )
+        except ValueError as e:
+            self.stdout.write(self.style.ERROR(str(e)))
             return
 
-        self.stdout.write("Splitting documents...")
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        chunks = splitter.split_documents(documents)
-        self.stdout.write(f"Created {len(chunks)} text chunks.")
+        manifest = None if kwargs['full'] else load_manifest(DB_PATH)
+        if manifest is not None and (
+            manifest.get('embedding_backend') != backend_id
+            # Built before vectors were normalised; new ones must not be mixed in
+            or not manifest.get('unit_vectors')
+            or not os.path.exists(os.path.join(DB_PATH, "index.faiss"))
+        ):
+            self.stdout.write(self.style.WARNING("Existing index is incompatible or missing, rebuilding from scratch."))
+            manifest = None
+        previous = set(manifest['chunks']) if manifest else set()
 
-        self.stdout.write("Generating embeddings and vector store...")
+        os.makedirs(DB_PATH, exist_ok=True)
+        checkpoint = EmbeddingCheckpoint(os.path.join(DB_PATH, "embeddings.checkpoint.jsonl"), backend_id)
         try:
-            embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001"
+            embeddings = get_embeddings()
+            embedder = BatchEmbedder(
+                embeddings,
+                batch_size=kwargs['batch_size'],
+                max_workers=kwargs['workers'],
+                max_retries=kwargs['max_retries'],
+                checkpoint=checkpoint,
+                log=self.stdout.write,
             )
-            
-            db = FAISS.from_documents(chunks, embeddings)
-            db.save_local(DB_PATH)
-            
+            db = None
+            if manifest is not None:
+                db = load_vector_store(DB_PATH, embeddings, mmap_index=False)
+
+            # Stream: load/split files in parallel, embed and index new chunks a window at a time.
+            # Only chunk hashes (for the manifest) are kept for the whole corpus.
+            self.stdout.write("Loading, splitting and embedding documents...")
+            sources = {}
+            # Catalogue chunks per disease; the chatbot's retriever sizes its filtered search with it
+            diseases = {}
+            window = []
+            added = 0
+            csv_rows = kwargs['csv_chunking'] == 'rows'
+            for path, chunks, error in iter_corpus_chunks(paths, kwargs['load_workers'], csv_rows):
+                file = os.path.basename(path)
+                if error is not None:
+                    self.stdout.write(self.style.ERROR(f"Error loading {file}: {str(error)}"))
+                    continue
+                self.stdout.write(f"Loaded {file}: {len(chunks)} chunks")
+
+                for chunk_id, text, metadata in chunks:
+                    # Identical chunks are only stored once
+                    if chunk_id in sources:
+                        continue
+                    sources[chunk_id] = metadata.get('source', '')
+                    if 'disease' in metadata:
+                        diseases[metadata['disease']] = diseases.get(metadata['disease'], 0) + 1
+                    if chunk_id not in previous:
+                        window.append((chunk_id, text, metadata))
+                    # Checked per chunk, so a single large PDF or CSV is also embedded a window at a time
+                    if len(window) >= kwargs['window']:
+                        db = self._add_window(db, window, embedder, embeddings)
+                        added += len(window)
+                        window = []
+            if window:
+                db = self._add_window(db, window, embedder, embeddings)
+                added += len(window)
+
+            if not sources:
+                self.stdout.write(self.style.WARNING("No valid documents loaded. Aborting."))
+                return
+
+            removed = [h for h in previous if h not in sources]
+            if removed:
+                db.delete(removed)
+
+            index_config = self._index_config(kwargs, db.index.d, db.index.ntotal)
+            # Stores saved by older builds are rewritten in the mmap-able layout
+            if (
+                manifest is None or added or removed or is_legacy_layout(DB_PATH)
+                or manifest.get('index', FLAT_INDEX) != index_config
+                or manifest.get('disease_chunks') != diseases
+            ):
+                served = None
+                if index_config != FLAT_INDEX:
+                    served = self._build_served_index(db.index, index_config, kwargs)
+                save_vector_store(DB_PATH, db, served)
+                save_manifest(DB_PATH, {
+                    'embedding_backend': backend_id,
+                    # get_embeddings() normalises; the retriever's relevance score relies on it
+                    'unit_vectors': True,
+                    # Changes on every rebuild; caches of chatbot answers are tied to it
+                    'build_id': uuid.uuid4().hex,
+                    'chunks': sources,
+                    'disease_chunks': diseases,
+                    'index': index_config,
+                })
+                size_mb = os.path.getsize(os.path.join(DB_PATH, INDEX_NAME)) / 2**20
+                self.stdout.write(f"Index {index_config['factory']}: {size_mb:.1f} MB")
+            # Everything is in the saved index now
+            checkpoint.clear()
+
+            self.stdout.write(f"Chunks reused: {len(sources) - added}, added: {added}, removed: {len(removed)}")
+            if embedder.rate_limited:
+                self.stdout.write(f"Rate-limited requests retried: {embedder.rate_limited}")
             self.stdout.write(self.style.SUCCESS(f"✅ Vector database created successfully at {DB_PATH}"))
-            
+
         except Exception as e:
-             self.stdout.write(self.style.ERROR(f"Failed to create vector store: {str(e)}"))
+            self.stdout.write(self.style.ERROR(f"Failed to create vector store: {str(e)}"))
+            if checkpoint.count:
+                self.stdout.write(self.style.WARNING(
+                    f"{checkpoint.count} embeddings checkpointed; re-run the command to resume."
+                ))
+
+    def _index_config(self, kwargs, dim, n):
+        nlist = kwargs['nlist'] or default_nlist(n)
+        factory = factory_string(
+            kwargs['index_type'],
+            dim,
+            kwargs['compression'],
+            nlist,
+            kwargs['pq_m'],
+            kwargs['pq_bits'],
+            kwargs['hnsw_m'],
+        )
+        if kwargs['index_type'] == 'ivf':
+            if nlist > n:
+                raise ValueError(f"--nlist {nlist} is larger than the number of chunks ({n})")
+            search_params = {'nprobe': min(kwargs['nprobe'], nlist)}
+        elif kwargs['index_type'] == 'hnsw':
+            search_params = {'efSearch': kwargs['ef_search']}
+        else:
+            search_params = {}
+        return {'factory': factory, 'search_params': search_params}
+
+    def _build_served_index(self, exact_index, index_config, kwargs):
+        factory = index_config['factory']
+        self.stdout.write(f"Building {factory} index...")
+        vectors = exact_index.reconstruct_n(0, exact_index.ntotal)
+        index = build_index(vectors, factory, kwargs['train_size'], kwargs['ef_construction'])
+
+        if kwargs['eval_queries'] > 0:
+            # Indexed chunks stand in for questions; ground truth is the exact index
+            queries = training_sample(vectors, kwargs['eval_queries'], seed=1)
+            k = min(kwargs['eval_k'], exact_index.ntotal)
+            nlist = faiss.extract_index_ivf(index).nlist if factory.startswith('IVF') else None
+            grid = search_param_grid(factory, nlist)
+            if index_config['search_params'] not in grid:
+                grid.append(index_config['search_params'])
+            exact_ms, rows = recall_report(exact_index, index, queries, k, grid)
+            self.stdout.write(f"Recall@{k} vs exact search ({len(queries)} queries, exact {exact_ms:.3f} ms/query):")
+            for row in rows:
+                setting = ", ".join(f"{name}={value}" for name, value in row['params'].items()) or factory
+                saved = "  <- saved" if row['params'] == index_config['search_params'] else ""
+                self.stdout.write(f"  {setting:<16} recall {row['recall']:.3f}  {row['latency_ms']:.3f} ms/query{saved}")
+
+        apply_search_params(index, index_config['search_params'])
+        return index
+
+    def _add_window(self, db, window, embedder, embeddings):
+        ids = [chunk_id for chunk_id, _, _ in window]
+        vectors = embedder.embed(ids, [text for _, text, _ in window])
+        text_embeddings = [(text, vectors[chunk_id]) for chunk_id, text, _ in window]
+        metadatas = [metadata for _, _, metadata in window]
+        if db is None:
+            return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+        db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        return db
@@ -0,0 +1,109 @@
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.disease_catalogue import iter_catalogue, treatment_type
+from api.models import Disease, Medicine, Symptom
+from api.symptom_index import bump_catalogue_version
+
+SYMPTOM_NAME_MAX = Symptom._meta.get_field('name').max_length
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk imports the disease/symptom/treatment catalogue from data/diseases.csv. '
+        'Add/update only: re-running adds new diseases, symptoms, links and medicines and refreshes '
+        'descriptions, but never removes links or medicines that are no longer in the file. '
+        'New diseases get severity Unknown; curated severity and specialist are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'data', 'diseases.csv'),
+            help='CSV file to import (default: data/diseases.csv)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows upserted per round of bulk queries')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            self.stdout.write(self.style.ERROR(f"Catalogue not found at {path}"))
+            return
+
+        self.stdout.write(f"Importing catalogue from {path}...")
+        totals = {'rows': 0, 'diseases': 0, 'symptoms': 0, 'links': 0, 'medicines': 0, 'skipped_symptoms': 0}
+        rows = iter_catalogue(path)
+
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                self._upsert_batch(batch, totals)
+            # Bulk queries bypass model signals, so invalidate the symptom index/cache explicitly
+            transaction.on_commit(bump_catalogue_version)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Upserted {totals['rows']} rows: {totals['diseases']} diseases, "
+            f"{totals['symptoms']} symptoms, {totals['links']} disease-symptom links, "
+            f"{totals['medicines']} medicines"
+        ))
+        if totals['skipped_symptoms']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Skipped {totals['skipped_symptoms']} symptom names longer than {SYMPTOM_NAME_MAX} characters"
+            ))
+
+    def _upsert_batch(self, batch, totals):
+        # Merge repeated diseases within the batch; ON CONFLICT cannot touch a row twice
+        merged = {}
+        for row in batch:
+            entry = merged.setdefault(row.disease, {'symptoms': [], 'treatments': []})
+            entry['symptoms'].extend(s for s in row.symptoms if s not in entry['symptoms'])
+            entry['treatments'].extend(t for t in row.treatments if t not in entry['treatments'])
+
+        symptom_names = {s for entry in merged.values() for s in entry['symptoms'] if len(s) <= SYMPTOM_NAME_MAX}
+        skipped = sum(len(s) > SYMPTOM_NAME_MAX for entry in merged.values() for s in entry['symptoms'])
+        Symptom.objects.bulk_create([Symptom(name=name) for name in symptom_names], ignore_conflicts=True)
+        symptom_ids = dict(Symptom.objects.filter(name__in=symptom_names).values_list('name', 'id'))
+
+        Disease.objects.bulk_create(
+            [
+                Disease(
+                    name=name,
+                    # The CSV has no severity; existing rows keep theirs (only description is updated)
+                    severity='Unknown',
+                    description=f"Symptoms: {', '.join(entry['symptoms'])}. Treatment: {', '.join(entry['treatments'])}.",
+                )
+                for name, entry in merged.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['description'],
+        )
+        disease_ids = dict(Disease.objects.filter(name__in=merged).values_list('name', 'id'))
+
+        Through = Disease.symptoms.through
+        links = [
+            Through(disease_id=disease_ids[name], symptom_id=symptom_ids[symptom])
+            for name, entry in merged.items()
+            for symptom in entry['symptoms'] if symptom in symptom_ids
+        ]
+        Through.objects.bulk_create(links, ignore_conflicts=True)
+
+        medicines = [
+            Medicine(name=treatment[:200], disease_id=disease_ids[name], type=treatment_type(treatment), dosage='')
+            for name, entry in merged.items()
+            for treatment in entry['treatments']
+        ]
+        Medicine.objects.bulk_create(medicines, ignore_conflicts=True)
+
+        totals['rows'] += len(batch)
+        totals['diseases'] += len(merged)
+        totals['symptoms'] += len(symptom_names)
+        totals['links'] += len(links)
+        totals['medicines'] += len(medicines)
+        totals['skipped_symptoms'] += skipped
@@ -0,0 +1,176 @@
+"""
+Per-request stage timings and the latency histograms behind /api/metrics/.
+
+ServerTimingMiddleware (api/middleware.py) starts a RequestTimings for each
+request in a context variable; code on the request path wraps its work in
+timed(stage). Context variables follow the request into sync_to_async and
+executor threads, so the ORM (through a database execute wrapper), the
+embedding cache, FAISS and the Gemini scheduler all report into the same
+request. Stage times are exclusive: an embedding done inside retrieval counts
+as 'embed', not also as 'retrieve'. Outside a request (warm-up, background
+summaries) timed() does nothing.
+
+At the end of the request the stages go out in the Server-Timing header and
+into histograms labelled by URL route (the pattern, not the path, so
+/api/doctors/<id>/ is one series) and stage. Stages are a fixed set and
+routes come from the URLconf, so the number of series is bounded.
+
+Metrics are per process: with several gunicorn workers each scrape sees the
+worker that answered it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+STAGES = ('db', 'embed', 'retrieve', 'score', 'llm', 'serialize')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UNMATCHED_ROUTE = 'unmatched'
+
+_current = ContextVar('doctalk_request_timings', default=None)
+
+
+class RequestTimings:
+    """Exclusive seconds per stage for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._children = []  # time spent in nested stages, one entry per open stage
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def start_request():
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def current_request():
+    return _current.get()
+
+
+def resume_request(timings):
+    """Make `timings` current again, e.g. while a streaming body is produced."""
+    _current.set(timings)
+
+
+@contextmanager
+def timed(stage):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings._children.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        nested = timings._children.pop()
+        timings.add(stage, max(0.0, elapsed - nested))
+        if timings._children:
+            timings._children[-1] += elapsed
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper: every query on the request path counts as 'db'."""
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver; the wrapper stays on the connection object across reconnects."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.request_seconds = {}  # route -> Histogram
+        self.stage_seconds = {}  # (route, stage) -> Histogram
+        self.responses = {}  # (route, status class) -> count
+
+    def observe(self, route, status_code, timings, total):
+        status_class = f"{status_code // 100}xx"
+        with self._lock:
+            self.responses[route, status_class] = self.responses.get((route, status_class), 0) + 1
+            self._histogram(self.request_seconds, route).observe(total)
+            for stage, seconds in timings.stages.items():
+                if stage in STAGES:
+                    self._histogram(self.stage_seconds, (route, stage)).observe(seconds)
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    def _histogram_lines(self, name, help_text, table, label_names):
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key, histogram in sorted(table.items()):
+            values = key if isinstance(key, tuple) else (key,)
+            labels = ",".join(f'{label}="{_escape(value)}"' for label, value in zip(label_names, values))
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += histogram.counts[-1]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+    def render(self, extra=()):
+        """Prometheus text exposition format. extra: [(name, type, help, value), ...] unlabelled samples."""
+        with self._lock:
+            lines = self._histogram_lines(
+                'doctalk_request_duration_seconds', 'Request latency by URL route.',
+                self.request_seconds, ('route',),
+            )
+            lines += self._histogram_lines(
+                'doctalk_stage_duration_seconds', 'Time per request spent in each stage (exclusive).',
+                self.stage_seconds, ('route', 'stage'),
+            )
+            lines += ["# HELP doctalk_responses_total Responses by URL route and status class.",
+                      "# TYPE doctalk_responses_total counter"]
+            for (route, status_class), count in sorted(self.responses.items()):
+                lines.append(f'doctalk_responses_total{{route="{_escape(route)}",status="{status_class}"}} {count}')
+        for name, kind, help_text, value in extra:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
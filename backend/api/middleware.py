@@ -0,0 +1,101 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import UNMATCHED_ROUTE, current_request, registry, resume_request, start_request
+
+
+class ServerTimingMiddleware:
+    """
+    Times each request by stage (see api/metrics.py), adds a Server-Timing
+    header and records the latency histograms served at /api/metrics/.
+
+    Streaming responses get the header with what is known before the body
+    starts; their histograms are recorded once the stream has finished.
+    Put it first in MIDDLEWARE so the total covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = start_request()
+        return self._finish(request, self.get_response(request), timings)
+
+    async def __acall__(self, request):
+        timings = start_request()
+        return self._finish(request, await self.get_response(request), timings)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that as 'serialize'
+        timings = current_request()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda r: timings.add('serialize', time.perf_counter() - started))
+        return response
+
+    def _finish(self, request, response, timings):
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else UNMATCHED_ROUTE
+        response['Server-Timing'] = timings.server_timing(timings.elapsed())
+
+        if not response.streaming:
+            registry.observe(route, response.status_code, timings, timings.elapsed())
+            return response
+
+        def done():
+            registry.observe(route, response.status_code, timings, timings.elapsed())
+
+        original = response.streaming_content
+        if response.is_async:
+            async def body():
+                resume_request(timings)
+                async for chunk in original:
+                    yield chunk
+                done()
+        else:
+            def body():
+                resume_request(timings)
+                yield from original
+                done()
+
+        response.streaming_content = body()
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise 6 is sync-only. Under ASGI, Django then runs every request
+    (not just static files) through it on the single thread-sensitive
+    executor thread, which blocks there until the async view finishes, so
+    concurrent requests are served one at a time. This version only leaves
+    the event loop to serve an actual static file.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
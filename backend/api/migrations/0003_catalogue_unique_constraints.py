@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Fold rows that would violate the new unique constraints into the oldest
+    one: duplicate diseases hand their symptoms and medicines to the
+    survivor, then duplicate medicines of a disease are dropped.
+    """
+    Disease = apps.get_model('api', 'Disease')
+    Medicine = apps.get_model('api', 'Medicine')
+
+    survivors = {}
+    for disease in Disease.objects.order_by('id'):
+        survivor = survivors.setdefault(disease.name, disease)
+        if survivor.pk == disease.pk:
+            continue
+        survivor.symptoms.add(*disease.symptoms.all())
+        Medicine.objects.filter(disease=disease).update(disease=survivor)
+        disease.delete()
+
+    seen = set()
+    for medicine in Medicine.objects.order_by('id'):
+        key = (medicine.disease_id, medicine.name, medicine.type)
+        if key in seen:
+            medicine.delete()
+        else:
+            seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_patientprofile_any_harmful_disease_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='disease',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='medicine',
+            constraint=models.UniqueConstraint(fields=('disease', 'name', 'type'), name='unique_medicine_per_disease'),
+        ),
+    ]
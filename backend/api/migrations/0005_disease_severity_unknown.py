@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:54
+
+from django.db import migrations, models
+
+
+def mark_imported_unknown(apps, schema_editor):
+    """
+    Rows written by import_catalogue got the old default 'Low' without anyone
+    choosing it; they are the ones with its generated description and no
+    specialist. Hand-curated rows are left alone.
+    """
+    Disease = apps.get_model('api', 'Disease')
+    Disease.objects.filter(
+        severity='Low', consult_specialist='', description__startswith='Symptoms: '
+    ).update(severity='Unknown')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='disease',
+            name='severity',
+            field=models.CharField(choices=[('Unknown', 'Unknown'), ('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High'), ('Critical', 'Critical')], default='Unknown', max_length=20),
+        ),
+        migrations.RunPython(mark_imported_unknown, migrations.RunPython.noop),
+    ]
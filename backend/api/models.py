@@ -51,20 +51,30 @@ class Symptom(models.Model):
 
 class Disease(models.Model):
     SEVERITY_CHOICES = (
+        # Not reviewed yet, e.g. imported from the catalogue CSV, which has no severity
+        ('Unknown', 'Unknown'),
         ('Low', 'Low'),
         ('Medium', 'Medium'),
         ('High', 'High'),
         ('Critical', 'Critical'),
     )
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)
     symptoms = models.ManyToManyField(Symptom, related_name='diseases')
     description = models.TextField()
-    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default='Low')
+    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default='Unknown')
     consult_specialist = models.CharField(max_length=100, help_text="Recommended specialist eg. Cardiologist", blank=True)
 
     def __str__(self):
         return self.name
 
+class CatalogueVersion(models.Model):
+    """Single row whose token changes on every catalogue write (see api/symptom_index.py)."""
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Catalogue version {self.version}"
+
 class Medicine(models.Model):
     TYPE_CHOICES = (
         ('Home', 'Home Remedy'),
@@ -80,6 +90,11 @@ class Medicine(models.Model):
     side_effects = models.TextField(blank=True)
     is_prescription_required = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['disease', 'name', 'type'], name='unique_medicine_per_disease'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.type})"
 
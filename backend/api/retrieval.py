@@ -0,0 +1,103 @@
+"""
+Retriever used by DocTalkChatbot.
+
+When the question names a disease from the catalogue, catalogue rows about
+other diseases are filtered out of the candidates (chunks without 'disease'
+metadata, e.g. PDF text, are always kept). The k chunks sent to Gemini are
+then the row for that disease plus relevant document text, instead of rows
+for similar-sounding diseases.
+
+The filter runs over the fetch_k nearest chunks, so fetch_k is scaled to how
+many chunks can pass it (known from the build manifest): for a corpus that is
+mostly catalogue rows that is close to the whole index, for one that is
+mostly documents it stays small. If nothing passes anyway, the unfiltered
+k nearest chunks are returned.
+
+Each returned chunk carries metadata['relevance'], its cosine similarity to
+the question, which the context assembler uses to drop weak matches. Rows
+about the named disease are flagged with metadata['named_disease'] and are
+never dropped that way: the question asked about them by name.
+"""
+import math
+from typing import Callable, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from .disease_lookup import disease_identity
+from .metrics import timed
+
+# Candidates fetched per expected passing chunk
+FETCH_MARGIN = 4
+
+
+class DiseaseFilteredRetriever(BaseRetriever):
+    vectorstore: VectorStore
+    # question -> disease name, or None when no disease is mentioned
+    disease_for: Callable[[str], Optional[str]]
+    k: int = 3
+    # Fewest candidates fetched before filtering
+    fetch_k: int = 20
+    # Most candidates fetched; every one is decoded to check its metadata
+    max_fetch_k: int = 5000
+    # disease identity -> number of chunks about it; None when unknown (stores built without it)
+    disease_chunks: Optional[dict] = None
+
+    def filtered_fetch_k(self, identity):
+        """Candidates to fetch so about FETCH_MARGIN x k of them pass the filter for `identity`; 0 if none can."""
+        if self.disease_chunks is None:
+            return self.fetch_k
+        total = self.vectorstore.index.ntotal
+        passing = total - sum(self.disease_chunks.values()) + self.disease_chunks.get(identity, 0)
+        if passing <= 0:
+            return 0
+        return min(total, self.max_fetch_k, max(self.fetch_k, math.ceil(self.k * FETCH_MARGIN * total / passing)))
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        try:
+            disease = self.disease_for(query)
+        except Exception:
+            disease = None
+        identity = disease_identity(disease) if disease is not None else None
+
+        def named(metadata):
+            return 'disease' in metadata and disease_identity(metadata['disease']) == identity
+
+        def keep(metadata):
+            return 'disease' not in metadata or named(metadata)
+
+        with timed('retrieve'):
+            found = []
+            if identity is not None:
+                fetch_k = self.filtered_fetch_k(identity)
+                if fetch_k:
+                    found = self.vectorstore.similarity_search_with_score(
+                        query, k=self.k, fetch_k=fetch_k, filter=keep
+                    )
+            if not found:
+                # No disease named, or nothing about it in the index
+                found = self.vectorstore.similarity_search_with_score(query, k=self.k)
+        return [with_relevance(doc, distance, identity is not None and named(doc.metadata)) for doc, distance in found]
+
+
+def with_relevance(doc, distance, named_disease=False):
+    """
+    Copy of doc with its cosine similarity. FAISS returns squared L2, which is
+    2 - 2 cos between unit vectors; get_embeddings() normalises every vector
+    and the manifest records it ('unit_vectors').
+    """
+    relevance = min(1.0, max(-1.0, 1.0 - float(distance) / 2))
+    metadata = {**doc.metadata, 'relevance': round(relevance, 4)}
+    if named_disease:
+        metadata['named_disease'] = True
+    return Document(page_content=doc.page_content, metadata=metadata, id=doc.id)
+
+
+def count_disease_chunks(diseases):
+    """{disease name: chunks} from the manifest -> {disease identity: chunks}, as the retriever takes it."""
+    counts = {}
+    for name, count in diseases.items():
+        identity = disease_identity(name)
+        counts[identity] = counts.get(identity, 0) + count
+    return counts
@@ -0,0 +1,25 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .metrics import install_query_timer
+from .models import Disease, Medicine, Symptom
+from .symptom_index import bump_catalogue_version
+
+
+def catalogue_changed(sender, **kwargs):
+    bump_catalogue_version()
+
+
+def disease_symptoms_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalogue_version()
+
+
+for model in (Disease, Symptom, Medicine):
+    post_save.connect(catalogue_changed, sender=model, dispatch_uid=f'catalogue_save_{model.__name__}')
+    post_delete.connect(catalogue_changed, sender=model, dispatch_uid=f'catalogue_delete_{model.__name__}')
+
+m2m_changed.connect(disease_symptoms_changed, sender=Disease.symptoms.through, dispatch_uid='catalogue_disease_symptoms')
+
+# ORM time on the request path is reported as the 'db' stage
+connection_created.connect(install_query_timer, dispatch_uid='time_queries')
@@ -0,0 +1,84 @@
+"""
+Result cache in front of the symptom scorer.
+
+Entries live in the Django cache alias named by SYMPTOM_CACHE_ALIAS (locmem
+LRU by default, a shared backend in production) and are keyed on the sorted
+set of recognised symptom names plus the catalogue version, so any
+Disease/Symptom/Medicine write makes every older entry unreachable.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class SymptomResultCache:
+    def __init__(self, alias):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def make_key(symptom_names, version, top_k):
+        digest = hashlib.sha1('\x1f'.join(sorted(set(symptom_names))).encode('utf-8')).hexdigest()
+        return f'symptom-check:{version}:{top_k}:{digest}'
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get_or_compute(self, key, compute):
+        results = self.backend.get(key)
+        if results is not None:
+            self._count(1, 0)
+            return results
+        self._count(0, 1)
+        results = compute()
+        self.backend.set(key, results)
+        return results
+
+    async def aget_or_compute(self, key, acompute):
+        results = await self.backend.aget(key)
+        if results is not None:
+            self._count(1, 0)
+            return results
+        self._count(0, 1)
+        results = await acompute()
+        await self.backend.aset(key, results)
+        return results
+
+    def get_or_compute_many(self, keys, compute_missing):
+        """
+        keys: one cache key per case. compute_missing(positions) must return
+        the results for those case positions, in order.
+        """
+        found = self.backend.get_many(set(keys))
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in found:
+                missing.setdefault(key, i)
+        self._count(len(keys) - len(missing), len(missing))
+        if missing:
+            computed = dict(zip(missing, compute_missing(list(missing.values()))))
+            self.backend.set_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+symptom_result_cache = SymptomResultCache(settings.SYMPTOM_CACHE_ALIAS)
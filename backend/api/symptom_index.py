@@ -0,0 +1,212 @@
+"""
+Process-local compiled index over the Disease/Symptom catalogue.
+
+Instead of loading every Disease on each symptom check, the catalogue is
+compiled once into a sparse disease x symptom incidence matrix plus the
+per-disease numbers the scorer needs. The matrix is stored column-wise
+(CSC): for every symptom, the positions of the diseases that list it. That
+is both the inverted index (posting lists) and what the NumPy scorer
+multiplies against. The index is tagged with the catalogue version and
+rebuilt lazily when that version changes (see api/signals.py). The version
+is a row in the database, shared by every worker, and re-read at most every
+CATALOGUE_VERSION_CHECK_INTERVAL seconds.
+"""
+import threading
+import time
+import uuid
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import CatalogueVersion, Disease
+from .symptom_search import SymptomMatcher, normalize_symptom
+
+SEVERITY_BOOST = {'Unknown': 0, 'Low': 0, 'Medium': 10, 'High': 20, 'Critical': 30}
+
+# Upper bound on cells in one cases x diseases block of a batch product
+BATCH_BLOCK_CELLS = 4_000_000
+
+
+CATALOGUE_ROW = 1
+
+_version = None  # (token, monotonic time it was read)
+_version_lock = threading.Lock()
+
+
+def _remember(version):
+    global _version
+    with _version_lock:
+        _version = (version, time.monotonic())
+    return version
+
+
+def _remembered():
+    """The last token read, while it is younger than CATALOGUE_VERSION_CHECK_INTERVAL."""
+    remembered = _version
+    if remembered is not None and time.monotonic() - remembered[1] < settings.CATALOGUE_VERSION_CHECK_INTERVAL:
+        return remembered[0]
+    return None
+
+
+def get_catalogue_version():
+    """
+    The token lives in the database, so a write in any worker (admin,
+    import_catalogue) reaches every other worker within
+    CATALOGUE_VERSION_CHECK_INTERVAL seconds; a process-local cache would
+    only ever see its own writes.
+    """
+    version = _remembered()
+    if version is not None:
+        return version
+    version = CatalogueVersion.objects.filter(pk=CATALOGUE_ROW).values_list('version', flat=True).first()
+    if version is None:
+        # First start: mint a token so every process rebuilds from the database
+        version = CatalogueVersion.objects.get_or_create(
+            pk=CATALOGUE_ROW, defaults={'version': uuid.uuid4().hex}
+        )[0].version
+    return _remember(version)
+
+
+async def aget_catalogue_version():
+    version = _remembered()
+    if version is not None:
+        return version
+    version = await CatalogueVersion.objects.filter(pk=CATALOGUE_ROW).values_list('version', flat=True).afirst()
+    if version is None:
+        version = (await CatalogueVersion.objects.aget_or_create(
+            pk=CATALOGUE_ROW, defaults={'version': uuid.uuid4().hex}
+        ))[0].version
+    return _remember(version)
+
+
+def bump_catalogue_version():
+    """Mark the catalogue as changed; called on any Disease/Symptom/Medicine write."""
+    global _version
+    CatalogueVersion.objects.update_or_create(pk=CATALOGUE_ROW, defaults={'version': uuid.uuid4().hex})
+    with _version_lock:
+        # Re-read on the next check, so this process sees its own write at once
+        _version = None
+
+
+class SymptomIndex:
+    def __init__(self, version, disease_rows, links):
+        self.version = version
+
+        # Per-disease data, indexed by position (ordered by id)
+        self.disease_ids = [row[0] for row in disease_rows]
+        self.names = [row[1] for row in disease_rows]
+        self.severities = [row[2] for row in disease_rows]
+        self.specialists = [row[3] for row in disease_rows]
+        self.severity_boosts = np.array([SEVERITY_BOOST.get(row[2], 0) for row in disease_rows], dtype=np.float64)
+
+        position = {disease_id: pos for pos, disease_id in enumerate(self.disease_ids)}
+        postings = {}
+        for disease_id, symptom_name in links:
+            postings.setdefault(normalize_symptom(symptom_name), []).append(position[disease_id])
+
+        # normalised symptom name -> column; column c owns indices[indptr[c]:indptr[c + 1]]
+        self.columns = {name: col for col, name in enumerate(postings)}
+        lengths = [len(p) for p in postings.values()]
+        self.indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        self.indices = np.fromiter(
+            (pos for p in postings.values() for pos in p), dtype=np.int64, count=int(self.indptr[-1])
+        )
+        self.symptom_counts = np.bincount(self.indices, minlength=len(self.disease_ids)).astype(np.float64)
+
+        self.matcher = SymptomMatcher(self.columns)
+
+    @classmethod
+    def build(cls, version):
+        disease_rows = list(
+            Disease.objects.order_by('id').values_list('id', 'name', 'severity', 'consult_specialist')
+        )
+        links = Disease.symptoms.through.objects.values_list('disease_id', 'symptom__name')
+        return cls(version, disease_rows, links)
+
+    def __len__(self):
+        return len(self.disease_ids)
+
+    def resolve(self, user_symptoms):
+        """Normalise free-text symptoms to known catalogue names, dropping unmatched ones."""
+        names = []
+        for text in user_symptoms:
+            name = self.matcher.resolve(text)
+            if name is not None and name not in names:
+                names.append(name)
+        return names
+
+    def lookup(self, symptom_names):
+        """Map normalised symptom names to matrix columns, dropping unknown ones."""
+        return sorted({self.columns[name] for name in symptom_names if name in self.columns})
+
+    def _postings(self, columns):
+        if not columns:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.indices[self.indptr[c]:self.indptr[c + 1]] for c in columns])
+
+    def match_counts(self, columns):
+        """Matrix-vector product: matched symptom count for every disease."""
+        return np.bincount(self._postings(columns), minlength=len(self))
+
+    def batch_match_counts(self, column_lists):
+        """
+        Matrix-matrix product of the cases x symptoms query matrix with the
+        incidence matrix, yielded in blocks of cases x diseases counts so
+        memory stays bounded for large batches.
+        """
+        n = len(self)
+        block = max(1, BATCH_BLOCK_CELLS // max(n, 1))
+        for start in range(0, len(column_lists), block):
+            cases = column_lists[start:start + block]
+            rows = [self._postings(columns) for columns in cases]
+            flat = np.concatenate([row + case * n for case, row in enumerate(rows)])
+            counts = np.bincount(flat, minlength=len(cases) * n).reshape(len(cases), n)
+            yield counts
+
+    def scores(self, counts):
+        """Normalise match counts and apply severity boosts; unmatched diseases get -inf."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.minimum(counts / self.symptom_counts * 100 + self.severity_boosts, 100)
+        scores[counts == 0] = -np.inf
+        return scores
+
+    @staticmethod
+    def top_k(scores, k):
+        """Positions of the k best scores, highest first, ties in catalogue order."""
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if len(candidates) > k:
+            part = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[scores[candidates] >= scores[part].min()]
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order[:k]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _ensure_index(version):
+    global _index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = SymptomIndex.build(version)
+        return _index
+
+
+def get_symptom_index():
+    version = get_catalogue_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    return _ensure_index(version)
+
+
+async def aget_symptom_index():
+    version = await aget_catalogue_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    # Rare rebuild: run the ORM queries off the event loop
+    return await sync_to_async(_ensure_index)(version)
@@ -0,0 +1,147 @@
+"""
+Symptom name normalisation and lookup.
+
+SymptomMatcher is built once per catalogue version (by SymptomIndex) from
+the known symptom names. It resolves free-text input to a catalogue name
+(exact, synonym, then trigram fuzzy match) and serves autocomplete
+suggestions from a sorted word-prefix table via bisect.
+"""
+import re
+from bisect import bisect_left
+from collections import Counter
+
+# Common lay terms -> catalogue symptom name. Only applied when the target
+# symptom actually exists in the catalogue.
+SYMPTOM_SYNONYMS = {
+    'temperature': 'fever',
+    'high temperature': 'fever',
+    'pyrexia': 'fever',
+    'feverish': 'fever',
+    'coughing': 'cough',
+    'tired': 'fatigue',
+    'tiredness': 'fatigue',
+    'exhaustion': 'fatigue',
+    'headaches': 'headache',
+    'head ache': 'headache',
+    'rhinorrhea': 'runny nose',
+    'running nose': 'runny nose',
+    'blocked nose': 'congestion',
+    'stuffy nose': 'congestion',
+    'breathlessness': 'shortness of breath',
+    'difficulty breathing': 'shortness of breath',
+    'body pain': 'body ache',
+    'body aches': 'body ache',
+    'throat pain': 'sore throat',
+    'feeling sick': 'nausea',
+    'vomit': 'vomiting',
+    'loss of smell': 'loss of taste or smell',
+}
+
+FUZZY_THRESHOLD = 0.6
+
+_SEPARATORS = re.compile(r'[-_/]+')
+_NOT_WORD = re.compile(r"[^\w\s()']+")
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_symptom(text):
+    """'  Runny-Nose ' -> 'runny nose'"""
+    text = _SEPARATORS.sub(' ', str(text).lower())
+    text = _NOT_WORD.sub('', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymptomMatcher:
+    def __init__(self, names):
+        self.names = sorted({normalize_symptom(n) for n in names if n})
+        self._ids = {name: i for i, name in enumerate(self.names)}
+
+        # (tail starting at a word boundary, name id), so 'throat' finds 'sore throat'
+        prefixes = []
+        for i, name in enumerate(self.names):
+            prefixes.append((name, i))
+            for m in re.finditer(r' ', name):
+                prefixes.append((name[m.end():], i))
+        prefixes.sort()
+        self._prefix_keys = [p[0] for p in prefixes]
+        self._prefix_ids = [p[1] for p in prefixes]
+
+        self._name_trigrams = [_trigrams(name) for name in self.names]
+        self._trigram_postings = {}
+        for i, grams in enumerate(self._name_trigrams):
+            for gram in grams:
+                self._trigram_postings.setdefault(gram, []).append(i)
+
+    def _prefix_matches(self, query):
+        start = bisect_left(self._prefix_keys, query)
+        ids = []
+        for pos in range(start, len(self._prefix_keys)):
+            if not self._prefix_keys[pos].startswith(query):
+                break
+            ids.append(self._prefix_ids[pos])
+        return ids
+
+    def _fuzzy_matches(self, query, threshold):
+        grams = _trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigram_postings.get(gram, ()))
+        scored = []
+        for i, common in shared.items():
+            similarity = common / (len(grams) + len(self._name_trigrams[i]) - common)
+            if similarity >= threshold:
+                scored.append((-similarity, i))
+        scored.sort()
+        return [(i, -neg) for neg, i in scored]
+
+    def best_match(self, text, threshold=FUZZY_THRESHOLD):
+        """(name, similarity) of the exact or closest fuzzy match, or None below threshold."""
+        name = normalize_symptom(text)
+        if name in self._ids:
+            return name, 1.0
+        if name:
+            fuzzy = self._fuzzy_matches(name, threshold)
+            if fuzzy:
+                return self.names[fuzzy[0][0]], fuzzy[0][1]
+        return None
+
+    def resolve(self, text):
+        """Canonical catalogue name for free-text input, or None if nothing is close enough."""
+        name = normalize_symptom(text)
+        if name in self._ids:
+            return name
+        synonym = SYMPTOM_SYNONYMS.get(name)
+        if synonym in self._ids:
+            return synonym
+        match = self.best_match(name)
+        return match[0] if match else None
+
+    def suggest(self, query, limit=10):
+        """Full-name prefix hits, then word-prefix hits, then fuzzy hits."""
+        query = normalize_symptom(query)
+        if not query:
+            return []
+
+        seen = set()
+        suggestions = []
+
+        def take(ids):
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    suggestions.append(self.names[i])
+
+        prefix_ids = sorted(set(self._prefix_matches(query)), key=lambda i: (len(self.names[i]), self.names[i]))
+        take(i for i in prefix_ids if self.names[i].startswith(query))
+        take(prefix_ids)
+        synonym = SYMPTOM_SYNONYMS.get(query)
+        if synonym in self._ids:
+            take([self._ids[synonym]])
+        if len(suggestions) < limit:
+            take(i for i, _ in self._fuzzy_matches(query, FUZZY_THRESHOLD / 2))
+        return suggestions[:limit]
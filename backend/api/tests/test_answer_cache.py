@@ -0,0 +1,62 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.answer_cache import SemanticAnswerCache, context_fingerprint
+from api.disease_lookup import DiseaseLookup
+from api.embeddings import HashingEmbeddings
+
+CATALOGUE = [
+    ('Diabetes Type 1', ['Thirst', 'weight loss'], ['Insulin'], '', ''),
+    ('Diabetes Type 2', ['Increased thirst', 'frequent urination'], ['Metformin'], '', ''),
+    ('Hepatitis A', ['Fever', 'jaundice'], ['Rest'], '', ''),
+    ('Hepatitis B', ['Fatigue', 'dark urine'], ['Antivirals'], '', ''),
+    ('Flu (Influenza)', ['Fever', 'cough'], ['Rest', 'Fluids'], '', ''),
+]
+
+NEAR_DUPLICATES = [
+    ('what are the symptoms of diabetes type 1', 'what are the symptoms of diabetes type 2'),
+    ('what are the symptoms of type 1 diabetes', 'what are the symptoms of type 2 diabetes'),
+    ('how is hepatitis a treated', 'how is hepatitis b treated'),
+]
+
+CONTEXT = context_fingerprint("disease: Diabetes Type 1\nsymptoms: Thirst, weight loss")
+
+
+class SemanticAnswerCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.embeddings = HashingEmbeddings()
+        lookup = DiseaseLookup('test', CATALOGUE)
+        self.cache = SemanticAnswerCache(self.embeddings, 'build-1', lookup.entities, threshold=0.9)
+
+    def similarity(self, a, b):
+        return float(np.dot(self.embeddings.embed_query(a), self.embeddings.embed_query(b)))
+
+    def test_near_duplicates_about_different_diseases_both_miss(self):
+        for first, second in NEAR_DUPLICATES:
+            with self.subTest(first=first, second=second):
+                # Close enough that similarity alone would have served the wrong answer
+                self.assertGreaterEqual(self.similarity(first, second), self.cache.threshold)
+                self.cache.reset('build-1')
+                self.cache.store(first, CONTEXT, f"answer about {first}", 1.0, 'build-1')
+                self.assertIsNone(self.cache.lookup(second, CONTEXT))
+
+                self.cache.reset('build-1')
+                self.cache.store(second, CONTEXT, f"answer about {second}", 1.0, 'build-1')
+                self.assertIsNone(self.cache.lookup(first, CONTEXT))
+
+    def test_rephrased_question_about_the_same_disease_hits(self):
+        self.cache.store('What are the symptoms of flu?', CONTEXT, 'flu answer', 1.0, 'build-1')
+        self.assertEqual(self.cache.lookup('what are the symptoms of  flu', CONTEXT), 'flu answer')
+        self.assertEqual(self.cache.lookup('what are the symptoms of the flu', CONTEXT), 'flu answer')
+
+    def test_negation_misses(self):
+        self.cache.store('is flu contagious', CONTEXT, 'yes', 1.0, 'build-1')
+        self.assertIsNone(self.cache.lookup('is flu not contagious', CONTEXT))
+
+    def test_different_context_misses(self):
+        self.cache.store('what are the symptoms of flu', CONTEXT, 'flu answer', 1.0, 'build-1')
+        self.assertIsNone(self.cache.lookup('what are the symptoms of flu', context_fingerprint('other context')))
+
+    def test_answers_from_a_replaced_index_are_not_stored(self):
+        self.cache.store('what are the symptoms of flu', CONTEXT, 'flu answer', 1.0, 'build-0')
+        self.assertIsNone(self.cache.lookup('what are the symptoms of flu', CONTEXT))
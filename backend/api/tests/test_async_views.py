@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from api.models import Disease, Symptom
+
+
+class AsyncAPIViewContractTests(TestCase):
+    """The async endpoints answer like the DRF APIViews they replaced."""
+
+    @classmethod
+    def setUpTestData(cls):
+        disease = Disease.objects.create(name='Flu', description='Flu', severity='Medium')
+        disease.symptoms.set([Symptom.objects.create(name='fever')])
+
+    def test_json_body(self):
+        response = self.client.post(reverse('symptom_check'), {'symptoms': ['fever']}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['disease_name'], 'Flu')
+
+    def test_form_encoded_body_is_accepted(self):
+        with mock.patch('api.views.DocTalkChatbot') as bot_class:
+            bot_class.return_value.aget_response = mock.AsyncMock(return_value='Rest and fluids.')
+            response = self.client.post(reverse('chat'), {'message': 'how is flu treated'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['response'], 'Rest and fluids.')
+
+    def test_unsupported_media_type_is_json_415(self):
+        response = self.client.post(reverse('symptom_check'), 'fever', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+        self.assertIn('Unsupported media type', response.json()['detail'])
+
+    def test_malformed_json_is_json_400(self):
+        response = self.client.post(reverse('symptom_check'), '{"symptoms": [', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+    def test_wrong_method_is_json_405(self):
+        response = self.client.get(reverse('symptom_check'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'POST, OPTIONS')
+        self.assertIn('detail', response.json())
+
+    def test_unhandled_error_is_json_500(self):
+        with mock.patch('api.views.acalculate_disease_probability', side_effect=RuntimeError('boom')), \
+                self.assertLogs('django.request', 'ERROR'):
+            response = self.client.post(
+                reverse('symptom_check'), {'symptoms': ['fever']}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'detail': 'A server error occurred.'})
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from api.checks import chat_session_cache_check
+from api.conversation import KEY_PREFIX, Conversation, new_session_id
+
+
+class ConversationStoreTests(TestCase):
+    def test_session_round_trips_through_the_shared_cache(self):
+        session_id = new_session_id()
+        conversation = Conversation(session_id)
+        conversation.add_turn('what are the symptoms of flu', 'Fever and cough.')
+        conversation.save()
+
+        # Stored in the session cache, not the per-process default one
+        self.assertIsNotNone(caches[settings.CHAT_SESSION_CACHE_ALIAS].get(KEY_PREFIX + session_id))
+        self.assertIsNone(caches['default'].get(KEY_PREFIX + session_id))
+        self.assertEqual(Conversation.load(session_id).turns, conversation.turns)
+
+    async def test_async_load_sees_sync_save(self):
+        session_id = new_session_id()
+        conversation = Conversation(session_id, summary='asked about flu')
+        await conversation.asave()
+        loaded = await Conversation.aload(session_id)
+        self.assertEqual(loaded.summary, 'asked about flu')
+
+    def test_configured_session_cache_passes_the_check(self):
+        self.assertEqual(chat_session_cache_check(None), [])
+
+    def test_per_process_session_cache_is_an_error(self):
+        caches_setting = {
+            **settings.CACHES,
+            settings.CHAT_SESSION_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+        with override_settings(CACHES=caches_setting):
+            self.assertEqual([error.id for error in chat_session_cache_check(None)], ['api.E002'])
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.disease_lookup import DiseaseLookup
+from api.models import Disease
+
+CATALOGUE = """disease,symptoms,treatment
+Stroke,Sudden numbness, confusion, trouble speaking,Emergency care, thrombolytics.
+Common Cold,Runny nose, sore throat, cough,Rest, hydration.
+"""
+
+
+@override_settings(CATALOGUE_VERSION_CHECK_INTERVAL=0)
+class TemplatedAnswerTests(TestCase):
+    def setUp(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'diseases.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(CATALOGUE)
+            call_command('import_catalogue', path=path, stdout=open(os.devnull, 'w'))
+
+    def test_imported_disease_makes_no_severity_claim(self):
+        answer = DiseaseLookup.build('v1').answer('what are the symptoms of stroke')
+        self.assertIn('sudden numbness', answer)
+        self.assertNotIn('severity', answer.lower())
+        self.assertNotIn('Specialist', answer)
+
+    def test_curated_severity_and_specialist_are_shown(self):
+        Disease.objects.filter(name='Stroke').update(severity='Critical', consult_specialist='Neurologist')
+        answer = DiseaseLookup.build('v2').answer('what are the symptoms of stroke')
+        self.assertIn('Typical severity: Critical.', answer)
+        self.assertIn('Specialist to consult: Neurologist.', answer)
@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from api.embedding_pipeline import EmbeddingCheckpoint
+
+
+class EmbeddingCheckpointTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'embeddings.checkpoint.jsonl')
+
+    def test_resume_from_torn_checkpoint_keeps_new_records(self):
+        checkpoint = EmbeddingCheckpoint(self.path, 'hashing')
+        checkpoint.add(['a', 'b'], [[0.1, 0.2], [0.3, 0.4]])
+        checkpoint.close()
+        # Crash halfway through writing the next record
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'id': 'c', 'vector': [0.5, 0.6]})[:12])
+
+        resumed = EmbeddingCheckpoint(self.path, 'hashing')
+        self.assertEqual(set(resumed.vectors), {'a', 'b'})
+        resumed.add(['d'], [[0.7, 0.8]])
+        resumed.close()
+
+        again = EmbeddingCheckpoint(self.path, 'hashing')
+        self.assertEqual(set(again.vectors), {'a', 'b', 'd'})
+        self.assertEqual(again.vectors['d'], [0.7, 0.8])
+
+    def test_checkpoint_from_another_backend_is_discarded(self):
+        checkpoint = EmbeddingCheckpoint(self.path, 'hashing')
+        checkpoint.add(['a'], [[0.1]])
+        checkpoint.close()
+        self.assertEqual(EmbeddingCheckpoint(self.path, 'google').vectors, {})
@@ -0,0 +1,43 @@
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Disease, Symptom
+
+LONG_SYMPTOM = 'x' * 101
+CATALOGUE = f"""disease,symptoms,treatment
+Stroke,Sudden numbness, confusion, {LONG_SYMPTOM},Emergency care, thrombolytics.
+"""
+
+
+class ImportCatalogueTests(TestCase):
+    def import_catalogue(self):
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'diseases.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(CATALOGUE)
+            call_command('import_catalogue', path=path, stdout=out)
+        return out.getvalue()
+
+    def test_imported_severity_is_unknown(self):
+        self.import_catalogue()
+        stroke = Disease.objects.get(name='Stroke')
+        self.assertEqual(stroke.severity, 'Unknown')
+        self.assertEqual(stroke.consult_specialist, '')
+
+    def test_reimport_keeps_curated_severity(self):
+        self.import_catalogue()
+        Disease.objects.filter(name='Stroke').update(severity='Critical', consult_specialist='Neurologist')
+        self.import_catalogue()
+        stroke = Disease.objects.get(name='Stroke')
+        self.assertEqual((stroke.severity, stroke.consult_specialist), ('Critical', 'Neurologist'))
+
+    def test_overlong_symptom_names_are_reported(self):
+        output = self.import_catalogue()
+        self.assertIn('Skipped 1 symptom names longer than 100 characters', output)
+        self.assertFalse(Symptom.objects.filter(name=LONG_SYMPTOM).exists())
+        self.assertEqual(Disease.objects.get(name='Stroke').symptoms.count(), 2)
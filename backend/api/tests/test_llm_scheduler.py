@@ -0,0 +1,217 @@
+import asyncio
+import time
+
+from django.test import SimpleTestCase
+
+from api.fake_llm import FAKE_ANSWER, FakeChatModel
+from api.llm_scheduler import (
+    BACKGROUND,
+    INTERACTIVE,
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMScheduler,
+    TokenBucket,
+)
+
+
+class CountingModel:
+    """FakeChatModel calls that count how often the model was actually invoked."""
+
+    def __init__(self, latency=0.1):
+        self.model = FakeChatModel(latency=latency)
+        self.invocations = 0
+
+    async def ainvoke(self, prompt='question'):
+        self.invocations += 1
+        return (await self.model.ainvoke(prompt)).content
+
+    def invoke(self, prompt='question'):
+        self.invocations += 1
+        return self.model.invoke(prompt).content
+
+
+class SingleflightTests(SimpleTestCase):
+    async def test_identical_calls_share_one_model_call(self):
+        scheduler = LLMScheduler(max_concurrency=4)
+        model = CountingModel()
+        results = await asyncio.gather(*(
+            scheduler.acall(model.ainvoke, key='what is flu') for _ in range(10)
+        ))
+        self.assertEqual(results, [FAKE_ANSWER] * 10)
+        self.assertEqual(model.invocations, 1)
+        self.assertEqual(scheduler.stats()['coalesced'], 9)
+        self.assertEqual(scheduler.stats()['inflight_keys'], 0)
+
+    async def test_different_keys_are_not_shared(self):
+        scheduler = LLMScheduler(max_concurrency=4)
+        model = CountingModel()
+        await asyncio.gather(scheduler.acall(model.ainvoke, key='a'), scheduler.acall(model.ainvoke, key='b'))
+        self.assertEqual(model.invocations, 2)
+
+    async def test_cancelled_follower_does_not_cancel_the_shared_call(self):
+        scheduler = LLMScheduler(max_concurrency=4)
+        model = CountingModel(latency=0.2)
+        leader = asyncio.ensure_future(scheduler.acall(model.ainvoke, key='what is flu'))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(scheduler.acall(model.ainvoke, key='what is flu')) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        # e.g. the client of one streamed request disconnected
+        followers[0].cancel()
+        results = await asyncio.gather(leader, *followers, return_exceptions=True)
+
+        self.assertEqual(results[0], FAKE_ANSWER)
+        self.assertIsInstance(results[1], asyncio.CancelledError)
+        self.assertEqual(results[2], FAKE_ANSWER)
+        self.assertEqual(model.invocations, 1)
+
+    async def test_cancelled_leader_fails_followers_cleanly(self):
+        scheduler = LLMScheduler(max_concurrency=4)
+        model = CountingModel(latency=0.2)
+        leader = asyncio.ensure_future(scheduler.acall(model.ainvoke, key='what is flu'))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(scheduler.acall(model.ainvoke, key='what is flu'))
+        await asyncio.sleep(0.01)
+
+        leader.cancel()
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+        self.assertIsInstance(results[0], asyncio.CancelledError)
+        self.assertEqual(type(results[1]).__name__, 'LLMUnavailableError')
+        self.assertEqual(scheduler.stats()['active'], 0)
+
+
+class PriorityTests(SimpleTestCase):
+    async def test_interactive_calls_are_admitted_before_background(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        model = CountingModel(latency=0.05)
+        started = []
+
+        def call(name, priority):
+            async def run():
+                started.append(name)
+                return await model.ainvoke()
+            return asyncio.ensure_future(scheduler.acall(run, priority=priority))
+
+        # Holds the only slot while the others queue, background ones first
+        busy = call('busy', INTERACTIVE)
+        await asyncio.sleep(0.01)
+        queued = [call('summary 1', BACKGROUND), call('summary 2', BACKGROUND)]
+        await asyncio.sleep(0.01)
+        queued += [call('chat 1', INTERACTIVE), call('chat 2', INTERACTIVE)]
+        await asyncio.gather(busy, *queued)
+
+        self.assertEqual(started, ['busy', 'chat 1', 'chat 2', 'summary 1', 'summary 2'])
+        self.assertEqual(scheduler.stats()['peak_queue_depth'], 4)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_spaced_at_the_rate(self):
+        bucket = TokenBucket(rate_per_minute=600, burst=2)  # 10 per second
+        waits = [bucket.reserve() for _ in range(4)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.1, delta=0.02)
+        self.assertAlmostEqual(waits[3], 0.2, delta=0.02)
+
+    def test_disabled_without_a_rate(self):
+        bucket = TokenBucket(rate_per_minute=0)
+        self.assertEqual([bucket.reserve() for _ in range(100)], [0.0] * 100)
+
+    def test_scheduler_spaces_calls(self):
+        scheduler = LLMScheduler(max_concurrency=4, rate_per_minute=1200, burst=1)  # one call per 50 ms
+        model = CountingModel(latency=0)
+        started = time.monotonic()
+        for _ in range(5):
+            scheduler.call(model.invoke)
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+
+def rate_limited():
+    raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_rate_limits_and_half_opens_after_cooldown(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+        breaker.record_failure(rate_limited=True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure(rate_limited=True)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        # One trial call only
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+        breaker.record_failure(rate_limited=True)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure(rate_limited=True)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.opens, 2)
+
+    def test_other_errors_do_not_count(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure(rate_limited=False)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_scheduler_fails_fast_while_open(self):
+        scheduler = LLMScheduler(max_concurrency=4, failure_threshold=2, cooldown=0.05, max_retries=0)
+        model = CountingModel(latency=0)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                scheduler.call(rate_limited)
+        with self.assertRaises(CircuitOpenError):
+            scheduler.call(model.invoke)
+        self.assertEqual(model.invocations, 0)
+
+        time.sleep(0.06)
+        self.assertEqual(scheduler.call(model.invoke), FAKE_ANSWER)
+        self.assertEqual(scheduler.stats()['circuit_state'], CircuitBreaker.CLOSED)
+
+    async def test_cancelled_trial_lets_the_next_call_through(self):
+        scheduler = LLMScheduler(max_concurrency=4, failure_threshold=1, cooldown=0.05, max_retries=0)
+        model = CountingModel(latency=0.5)
+        with self.assertRaises(RuntimeError):
+            await scheduler.acall(self._arate_limited)
+        await asyncio.sleep(0.06)
+
+        # The trial call's client goes away before Gemini answers
+        trial = asyncio.create_task(scheduler.acall(model.ainvoke))
+        await asyncio.sleep(0.05)
+        self.assertEqual(scheduler.breaker.state, CircuitBreaker.HALF_OPEN)
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+
+        model.model.latency = 0
+        self.assertEqual(await scheduler.acall(model.ainvoke), FAKE_ANSWER)
+        self.assertEqual(scheduler.breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_stream_closed_during_trial_releases_it(self):
+        scheduler = LLMScheduler(max_concurrency=4, failure_threshold=1, cooldown=0.05, max_retries=0)
+        with self.assertRaises(RuntimeError):
+            await scheduler.acall(self._arate_limited)
+        await asyncio.sleep(0.06)
+
+        async def stream():
+            async with scheduler.aslot():
+                yield 'token'
+                yield 'token'
+
+        tokens = stream()
+        await tokens.__anext__()
+        # Client disconnects mid-stream
+        await tokens.aclose()
+        self.assertTrue(scheduler.breaker.allow())
+
+    @staticmethod
+    async def _arate_limited():
+        rate_limited()
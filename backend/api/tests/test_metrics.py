@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from api.answer_cache import SemanticAnswerCache, context_fingerprint
+from api.disease_lookup import DiseaseLookup
+from api.embeddings import HashingEmbeddings
+from api.symptom_cache import symptom_result_cache
+
+
+def metric(body, name):
+    for line in body.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split()[1])
+    raise AssertionError(f"{name} not exported")
+
+
+class MetricsViewTests(TestCase):
+    def test_answer_cache_counters_are_exported(self):
+        lookup = DiseaseLookup('test', [('Flu (Influenza)', ['Fever', 'cough'], ['Rest'], '', '')])
+        answer_cache = SemanticAnswerCache(HashingEmbeddings(), 'build-1', lookup.entities)
+        context = context_fingerprint('disease: Flu (Influenza)')
+        answer_cache.lookup('what are the symptoms of flu', context)
+        answer_cache.store('what are the symptoms of flu', context, 'Fever and cough.', 1.5, 'build-1')
+        answer_cache.lookup('what are the symptoms of flu', context)
+        bot = SimpleNamespace(query_embeddings=None, answer_cache=answer_cache)
+
+        with mock.patch('api.views.DocTalkChatbot.get_if_ready', return_value=bot):
+            body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertEqual(metric(body, 'doctalk_answer_cache_hits_total'), 1)
+        self.assertEqual(metric(body, 'doctalk_answer_cache_misses_total'), 1)
+        self.assertEqual(metric(body, 'doctalk_answer_cache_generation_seconds_saved_total'), 1.5)
+
+    def test_symptom_cache_counters_are_exported(self):
+        with mock.patch.object(symptom_result_cache, 'hits', 3), mock.patch.object(symptom_result_cache, 'misses', 2):
+            body = self.client.get(reverse('metrics')).content.decode()
+        self.assertEqual(metric(body, 'doctalk_symptom_cache_hits_total'), 3)
+        self.assertEqual(metric(body, 'doctalk_symptom_cache_misses_total'), 2)
@@ -0,0 +1,83 @@
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from langchain_community.vectorstores import FAISS
+
+from api.context import ContextAssembler
+from api.disease_catalogue import iter_catalogue
+from api.disease_lookup import DiseaseLookup, disease_identity
+from api.embeddings import HashingEmbeddings, UnitEmbeddings
+from api.ingestion import iter_csv_rows
+from api.retrieval import DiseaseFilteredRetriever, count_disease_chunks
+
+CATALOGUE = os.path.join(settings.BASE_DIR, 'data', 'diseases.csv')
+
+
+class CatalogueRecallTests(SimpleTestCase):
+    """Every catalogue disease, asked about by name, retrieves its own row on the catalogue-only index."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        docs = list(iter_csv_rows(CATALOGUE))
+        cls.vectorstore = FAISS.from_documents(docs, HashingEmbeddings())
+        cls.lookup = DiseaseLookup.from_catalogue('test', CATALOGUE)
+        cls.disease_chunks = count_disease_chunks(Counter(doc.metadata['disease'] for doc in docs))
+        cls.names = sorted({row.disease for row in iter_catalogue(CATALOGUE)})
+
+    def retriever(self, **kwargs):
+        return DiseaseFilteredRetriever(
+            vectorstore=self.vectorstore, disease_for=self.lookup.mentioned_disease, k=3, **kwargs
+        )
+
+    def recall(self, retriever, template):
+        assembler = ContextAssembler()
+        found, empty_context = 0, []
+        for name in self.names:
+            docs = retriever.invoke(template.format(name))
+            if any(disease_identity(doc.metadata.get('disease', '')) == disease_identity(name) for doc in docs):
+                found += 1
+            if not assembler.select(docs):
+                empty_context.append(name)
+        return found / len(self.names), empty_context
+
+    def test_recall_over_catalogue_questions(self):
+        retriever = self.retriever(disease_chunks=self.disease_chunks)
+        for template in ("What is {}?", "Can {} be serious?"):
+            with self.subTest(template=template):
+                recall, empty_context = self.recall(retriever, template)
+                self.assertEqual(recall, 1.0)
+                self.assertEqual(empty_context, [])
+
+    def test_unknown_selectivity_still_returns_documents(self):
+        # Stores built without disease counts search a fixed fetch_k and fall back to unfiltered results
+        retriever = self.retriever()
+        for name in self.names:
+            self.assertTrue(retriever.invoke(f"What is {name}?"), name)
+
+    def test_disease_missing_from_index_falls_back_to_unfiltered(self):
+        retriever = DiseaseFilteredRetriever(
+            vectorstore=self.vectorstore, disease_for=lambda question: 'Vanishing Syndrome', k=3,
+            disease_chunks=self.disease_chunks,
+        )
+        self.assertEqual(retriever.filtered_fetch_k(disease_identity('Vanishing Syndrome')), 0)
+        self.assertEqual(len(retriever.invoke("What is vanishing syndrome?")), 3)
+
+
+class ScaledEmbeddings(HashingEmbeddings):
+    """A provider whose vectors are not unit length."""
+
+    def _embed(self, text):
+        return [value * 7.5 for value in super()._embed(text)]
+
+
+class RelevanceScaleTests(SimpleTestCase):
+    def test_relevance_is_cosine_for_non_unit_backends(self):
+        texts = ['fever and chills with a cough', 'itchy red rash on the arms']
+        vectorstore = FAISS.from_texts(texts, UnitEmbeddings(ScaledEmbeddings()))
+        retriever = DiseaseFilteredRetriever(vectorstore=vectorstore, disease_for=lambda query: None, k=2)
+        docs = retriever.invoke(texts[0])
+        self.assertAlmostEqual(docs[0].metadata['relevance'], 1.0, places=3)
+        self.assertTrue(all(-1.0 <= doc.metadata['relevance'] <= 1.0 for doc in docs))
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api.models import Disease, Medicine, Symptom
+
+
+@override_settings(CATALOGUE_VERSION_CHECK_INTERVAL=0)
+class SymptomCheckQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        symptoms = {name: Symptom.objects.create(name=name) for name in ('fever', 'cough', 'headache', 'rash')}
+        catalogue = [
+            ('Flu', ['fever', 'cough', 'headache'], 'Medium'),
+            ('Common Cold', ['cough', 'headache'], 'Low'),
+            ('Measles', ['fever', 'rash'], 'High'),
+            ('Migraine', ['headache'], 'Medium'),
+        ]
+        for name, symptom_names, severity in catalogue:
+            disease = Disease.objects.create(name=name, description=name, severity=severity)
+            disease.symptoms.set([symptoms[s] for s in symptom_names])
+            Medicine.objects.create(name='Rest', disease=disease, type='Home', dosage='As needed')
+            Medicine.objects.create(name='Paracetamol', disease=disease, type='Allopathy', dosage='500mg')
+
+    def setUp(self):
+        caches[settings.SYMPTOM_CACHE_ALIAS].clear()
+        # Compile the symptom index so the counts below are for a warm index
+        self.client.post(reverse('symptom_check'), {'symptoms': ['rash']}, content_type='application/json')
+
+    def test_symptom_check_cache_miss(self):
+        # Catalogue version + medicines of the top-k diseases, however many diseases matched
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                reverse('symptom_check'), {'symptoms': ['fever', 'cough', 'headache']}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0]['disease_name'], 'Flu')
+        self.assertTrue(all(result['allopathic_medicines'] for result in results))
+
+    def test_symptom_check_cache_hit(self):
+        self.client.post(reverse('symptom_check'), {'symptoms': ['fever']}, content_type='application/json')
+        with self.assertNumQueries(1):
+            self.client.post(reverse('symptom_check'), {'symptoms': ['fever']}, content_type='application/json')
+
+    def test_batch_cache_miss(self):
+        cases = [{'symptoms': ['fever']}, {'symptoms': ['cough']}, {'symptoms': ['headache', 'rash']}]
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('symptom_check_batch'), {'cases': cases}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
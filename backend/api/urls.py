@@ -3,7 +3,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from .views import RegisterUserView, UserProfileView, SymptomCheckView, ReportUploadView, DoctorListView, AppointmentView, ChatbotView
+from .views import RegisterUserView, UserProfileView, SymptomCheckView, SymptomCheckBatchView, SymptomSuggestView, ReportUploadView, DoctorListView, AppointmentView, ChatbotView, ChatStreamView, ReadinessView, metrics_view
 
 urlpatterns = [
     path('register/', RegisterUserView.as_view(), name='register'),
@@ -11,8 +11,13 @@ urlpatterns = [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('symptom-check/', SymptomCheckView.as_view(), name='symptom_check'),
+    path('symptom-check/batch/', SymptomCheckBatchView.as_view(), name='symptom_check_batch'),
+    path('symptoms/suggest/', SymptomSuggestView.as_view(), name='symptom_suggest'),
     path('report-analyze/', ReportUploadView.as_view(), name='report_analyze'),
     path('doctors/', DoctorListView.as_view(), name='doctor_list'),
     path('appointments/book/', AppointmentView.as_view(), name='book_appointment'),
     path('chat/', ChatbotView.as_view(), name='chat'),
+    path('chat/stream/', ChatStreamView.as_view(), name='chat_stream'),
+    path('health/ready/', ReadinessView.as_view(), name='health_ready'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,59 @@
+"""
+Helpers for the on-disk chatbot vector store (vectorstore/).
+
+Alongside index.faiss the build writes manifest.json, which maps the content
+hash of every chunk in the index to its source. Chunk hashes double as the
+FAISS docstore ids, so an incremental build can tell which chunks are
+unchanged, new or gone without re-embedding anything.
+
+A chunk's hash covers its text and the fields that identify it regardless of
+where it sits: the file name (not the absolute path, so moving the checkout
+changes nothing) and the disease of catalogue rows. Positional metadata such
+as 'row' and 'page' is stored with the chunk but left out of the hash, or
+deleting one CSV row would shift, and re-embed, every row after it.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT = 2
+
+# Metadata fields that are part of a chunk's identity
+IDENTITY_FIELDS = ('disease',)
+
+
+def chunk_hash(doc):
+    identity = {field: doc.metadata[field] for field in IDENTITY_FIELDS if field in doc.metadata}
+    identity['source'] = os.path.basename(str(doc.metadata.get('source', '')))
+    payload = json.dumps(
+        {'text': doc.page_content, 'metadata': identity},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def manifest_path(db_path):
+    return os.path.join(db_path, MANIFEST_NAME)
+
+
+def load_manifest(db_path):
+    """Return the manifest dict, or None if there is no (readable) manifest."""
+    try:
+        with open(manifest_path(db_path), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != MANIFEST_FORMAT:
+        return None
+    return manifest
+
+
+def save_manifest(db_path, manifest):
+    manifest = dict(manifest, format=MANIFEST_FORMAT)
+    tmp_path = manifest_path(db_path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    # Atomic swap so readers never see a half-written manifest
+    os.replace(tmp_path, manifest_path(db_path))
@@ -76,22 +76,132 @@ class UserProfileView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         return Response({"status": "success"})
-from .ai_engine import calculate_disease_probability
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import classonlymethod
+from django.utils.log import log_response
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from .ai_engine import acalculate_disease_probability, calculate_disease_probability_batch
+from .metrics import timed
+from .symptom_index import get_symptom_index
 
-class SymptomCheckView(APIView):
-    # Allow any for now to test easily, or IsAuthenticated
-    permission_classes = [permissions.AllowAny] 
+class RequestParseError(Exception):
+    def __init__(self, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
 
-    def post(self, request):
-        symptoms = request.data.get('symptoms', [])
-        age = request.data.get('age')
-        weight = request.data.get('weight')
+class AsyncAPIView(View):
+    """
+    Async counterpart of APIView for the public endpoints that mostly wait on
+    Gemini or the database (DRF views cannot be async). CSRF-exempt like
+    APIView. Under ASGI these run on the event loop, so one worker keeps many
+    requests in flight.
+
+    Keeps APIView's contract: JSON, form-encoded and multipart bodies are
+    accepted (form fields read like request.data, last value wins), other
+    content types get a JSON 415, malformed JSON a JSON 400, and every error
+    response, including unhandled exceptions, is JSON with a 'detail' key.
+    """
+    FORM_CONTENT_TYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except RequestParseError as e:
+            return JsonResponse({"detail": e.detail}, status=e.status_code)
+        except Exception as e:
+            response = JsonResponse(
+                {"detail": "A server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+            # Logged like Django's own 500 handling (django.request logger, ADMINS mail)
+            log_response(
+                "%s: %s", response.reason_phrase, request.path, response=response, request=request, exception=e
+            )
+            return response
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return JsonResponse(
+            {"detail": f'Method "{request.method}" not allowed.'},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            headers={'Allow': ', '.join(self._allowed_methods())},
+        )
+
+    @classmethod
+    def get_data(cls, request):
+        if not request.body:
+            return {}
+        if request.content_type in cls.FORM_CONTENT_TYPES:
+            return {key: request.POST.get(key) for key in request.POST}
+        if request.content_type != 'application/json' and not request.content_type.endswith('+json'):
+            raise RequestParseError(
+                f'Unsupported media type "{request.content_type}" in request.',
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            data = json.loads(request.body)
+        except ValueError as e:
+            raise RequestParseError(f"JSON parse error - {e}")
+        return data if isinstance(data, dict) else {}
+
+class SymptomCheckView(AsyncAPIView):
+
+    async def post(self, request):
+        data = self.get_data(request)
+        symptoms = data.get('symptoms', [])
+        age = data.get('age')
+        weight = data.get('weight')
         
-        if not symptoms:
-            return Response({"error": "No symptoms provided"}, status=status.HTTP_400_BAD_REQUEST)
+        if not symptoms or not isinstance(symptoms, list):
+            return JsonResponse({"error": "No symptoms provided"}, status=status.HTTP_400_BAD_REQUEST)
             
-        results = calculate_disease_probability(symptoms, age, weight)
+        results = await acalculate_disease_probability(symptoms, age, weight)
+        with timed('serialize'):
+            return JsonResponse({"results": results})
+
+class SymptomCheckBatchView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        cases = request.data.get('cases', [])
+
+        if not cases or not isinstance(cases, list):
+            return Response({"error": "No cases provided"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(cases) > settings.SYMPTOM_BATCH_MAX_CASES:
+            return Response(
+                {"error": f"At most {settings.SYMPTOM_BATCH_MAX_CASES} cases per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        symptom_lists = []
+        for i, case in enumerate(cases):
+            symptoms = case.get('symptoms') if isinstance(case, dict) else None
+            if not symptoms or not isinstance(symptoms, list):
+                return Response({"error": f"No symptoms provided for case {i}"}, status=status.HTTP_400_BAD_REQUEST)
+            symptom_lists.append(symptoms)
+
+        results = calculate_disease_probability_batch(symptom_lists)
         return Response({"results": results})
+class SymptomSuggestView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+
+        suggestions = get_symptom_index().matcher.suggest(query, limit)
+        return Response({"suggestions": suggestions})
+
 class ReportUploadView(APIView):
     permission_classes = [permissions.AllowAny] # Change to IsAuthenticated later
     
@@ -137,16 +247,121 @@ class AppointmentView(APIView):
         })
 
 from .chatbot_logic import DocTalkChatbot
+from .conversation import is_valid_session_id, new_session_id
 
-class ChatbotView(APIView):
-    permission_classes = [permissions.AllowAny]
+def _chat_session_id(data):
+    """The session to continue, a new one if none was given, or None if the given id is malformed."""
+    session_id = data.get('session_id')
+    if session_id is None:
+        return new_session_id()
+    return session_id if is_valid_session_id(session_id) else None
 
-    def post(self, request):
-        message = request.data.get('message')
-        if not message:
-            return Response({"error": "Message is required"}, status=status.HTTP_400_BAD_REQUEST)
+class ChatbotView(AsyncAPIView):
+
+    async def post(self, request):
+        data = self.get_data(request)
+        message = data.get('message')
+        if not message or not isinstance(message, str):
+            return JsonResponse({"error": "Message is required"}, status=status.HTTP_400_BAD_REQUEST)
+        session_id = _chat_session_id(data)
+        if session_id is None:
+            return JsonResponse({"error": "Invalid session_id"}, status=status.HTTP_400_BAD_REQUEST)
         
-        bot = DocTalkChatbot()
-        response = bot.get_response(message)
+        # First use loads the index and clients; keep that off the event loop
+        bot = await sync_to_async(DocTalkChatbot, thread_sensitive=False)()
+        response = await bot.aget_response(message, session_id)
         
-        return Response({"response": response})
+        with timed('serialize'):
+            return JsonResponse({"response": response, "session_id": session_id})
+
+class ChatStreamView(AsyncAPIView):
+    """Server-sent events version of ChatbotView: tokens are sent as they are generated."""
+
+    async def post(self, request):
+        data = self.get_data(request)
+        message = data.get('message')
+        if not message or not isinstance(message, str):
+            return JsonResponse({"error": "Message is required"}, status=status.HTTP_400_BAD_REQUEST)
+        session_id = _chat_session_id(data)
+        if session_id is None:
+            return JsonResponse({"error": "Invalid session_id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        bot = await sync_to_async(DocTalkChatbot, thread_sensitive=False)()
+
+        # Async iterator: under ASGI each event is flushed as soon as it is produced
+        async def events():
+            yield f"event: session\ndata: {json.dumps({'session_id': session_id})}\n\n"
+            async for event, data in bot.astream_response(message, session_id):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop reverse proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+from . import warmup
+
+class ReadinessView(APIView):
+    """
+    Readiness probe: 503 while the startup warm-up is still running, 200 once
+    it has finished (or when warm-up is disabled), with per-stage timings.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        state = warmup.status()
+        ready = state['finished'] or not state['started']
+        bot = DocTalkChatbot.get_if_ready()
+        state['chatbot'] = bot.mode if bot is not None else "not_loaded"
+        state['ready'] = ready
+        return Response(state, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+from django.http import HttpResponse
+from .context import get_context_assembler
+from .llm_scheduler import get_llm_scheduler
+from .metrics import registry
+from .symptom_cache import symptom_result_cache
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint: request/stage latency histograms plus LLM
+    scheduler, context-assembly, symptom-cache and answer-cache counters.
+    When METRICS_TOKEN is set the scraper must send it as a bearer token.
+    """
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {settings.METRICS_TOKEN}":
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+    scheduler = get_llm_scheduler().stats()
+    context = get_context_assembler().stats()
+    symptom_results = symptom_result_cache.stats()
+    bot = DocTalkChatbot.get_if_ready()
+    extra = [
+        ('doctalk_llm_active_calls', 'gauge', 'Gemini calls in progress.', scheduler['active']),
+        ('doctalk_llm_queue_depth', 'gauge', 'Requests waiting for a Gemini slot.', scheduler['queue_depth']),
+        ('doctalk_llm_calls_total', 'counter', 'Gemini calls made.', scheduler['calls']),
+        ('doctalk_llm_coalesced_total', 'counter', 'Requests that shared an in-flight call.', scheduler['coalesced']),
+        ('doctalk_llm_rate_limited_total', 'counter', 'Calls rejected by the provider quota.', scheduler['rate_limited']),
+        ('doctalk_llm_circuit_open', 'gauge', '1 while the circuit breaker is open.', int(scheduler['circuit_state'] == 'open')),
+        ('doctalk_context_tokens_sent_total', 'counter', 'Estimated RAG context tokens sent.', context['tokens_sent']),
+        ('doctalk_context_tokens_saved_total', 'counter', 'Estimated RAG context tokens trimmed.', context['tokens_saved']),
+        ('doctalk_symptom_cache_hits_total', 'counter', 'Symptom checks served from the result cache.', symptom_results['hits']),
+        ('doctalk_symptom_cache_misses_total', 'counter', 'Symptom checks scored (result cache misses).', symptom_results['misses']),
+    ]
+    if bot is not None and bot.query_embeddings is not None:
+        embeddings = bot.query_embeddings.stats()
+        extra.append((
+            'doctalk_query_embedding_misses_total', 'counter', 'Query embeddings computed (cache misses).',
+            embeddings['misses'],
+        ))
+    if bot is not None and bot.answer_cache is not None:
+        answers = bot.answer_cache.stats()
+        extra += [
+            ('doctalk_answer_cache_hits_total', 'counter', 'Chat answers served from the semantic cache.', answers['hits']),
+            ('doctalk_answer_cache_misses_total', 'counter', 'Chat answers not found in the semantic cache.', answers['misses']),
+            (
+                'doctalk_answer_cache_generation_seconds_saved_total', 'counter',
+                'Gemini generation time the cached answers originally took.', answers['generation_seconds_saved'],
+            ),
+        ]
+    return HttpResponse(registry.render(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
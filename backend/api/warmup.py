@@ -0,0 +1,117 @@
+"""
+Background warm-up of the expensive, lazily built parts of the API.
+
+ApiConfig.ready() starts one daemon thread that imports the chatbot module
+(and with it langchain), compiles the symptom index and disease lookup and
+builds the DocTalkChatbot singleton, so the first user after a cold start
+does not pay for it. Each stage's status and duration is recorded here and reported by
+/api/health/ready/. Requests that arrive mid-warm-up simply block on the
+chatbot's init lock instead of starting a second initialisation.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_stages = {}
+_started_at = None
+_finished = threading.Event()
+
+
+@contextmanager
+def stage(name):
+    """Time a block and record it as a warm-up stage (also used by lazy init)."""
+    with _lock:
+        _stages[name] = {'status': 'running', 'seconds': None}
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        with _lock:
+            _stages[name] = {
+                'status': 'failed',
+                'seconds': round(time.perf_counter() - started, 3),
+                'error': str(e),
+            }
+        raise
+    with _lock:
+        _stages[name] = {'status': 'done', 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def _run():
+    from django.db import connection
+
+    try:
+        with stage('imports'):
+            from .chatbot_logic import DocTalkChatbot
+    except Exception:
+        _finished.set()
+        return
+
+    try:
+        with stage('symptom_index'):
+            from .symptom_index import get_symptom_index
+            get_symptom_index()
+        with stage('disease_lookup'):
+            from .disease_lookup import get_disease_lookup
+            get_disease_lookup()
+    except Exception:
+        # The chatbot works without the catalogue (no fast path); keep going
+        pass
+    finally:
+        connection.close()
+
+    try:
+        # DocTalkChatbot records its own stages (embeddings, vector_store, llm)
+        DocTalkChatbot()
+    finally:
+        _finished.set()
+
+
+SERVER_COMMANDS = {'gunicorn', 'uvicorn', 'daphne', 'hypercorn'}
+
+
+def should_warm_up(mode='auto', argv=None):
+    """
+    Warm up only in processes that serve requests. In 'auto' mode that means
+    a known server entry point; tests, celery, scripts, `python -c` and other
+    manage.py commands don't load FAISS and the LLM.
+    """
+    if mode in (True, 'True'):
+        return True
+    if mode != 'auto':
+        return False
+    argv = sys.argv if argv is None else argv
+    if not argv:
+        return False
+    command = os.path.basename(argv[0])
+    if command == '__main__.py':
+        # python -m gunicorn / python -m uvicorn
+        command = os.path.basename(os.path.dirname(argv[0]))
+    if command in SERVER_COMMANDS:
+        return True
+    if command != 'manage.py' or len(argv) < 2 or argv[1] != 'runserver':
+        return False
+    # With the autoreloader only the child process serves requests
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+
+
+def start_warmup():
+    global _started_at
+    with _lock:
+        if _started_at is not None:
+            return
+        _started_at = time.time()
+    threading.Thread(target=_run, name='doctalk-warmup', daemon=True).start()
+
+
+def status():
+    with _lock:
+        stages = {name: dict(info) for name, info in _stages.items()}
+    return {
+        'started': _started_at is not None,
+        'finished': _finished.is_set(),
+        'stages': stages,
+    }
@@ -41,9 +41,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total includes the other middleware (api/metrics.py)
+    'api.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise that doesn't force async requests onto one thread (see api/middleware.py)
+    'api.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,6 +74,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'doctalk.wsgi.application'
+ASGI_APPLICATION = 'doctalk.asgi.application'
 
 
 # Database
@@ -84,6 +88,79 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# locmem by default; set REDIS_URL (needs the redis package) to share caches
+# across workers/instances. Size the Redis instance with an LRU maxmemory policy.
+
+SYMPTOM_CACHE_ALIAS = 'symptom_check'
+# Chat sessions must be seen by every worker, so they never go to locmem:
+# Redis when configured, otherwise a table in the database (created by
+# `manage.py createcachetable`, which build.sh runs)
+CHAT_SESSION_CACHE_ALIAS = 'chat_sessions'
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+        SYMPTOM_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'symptom',
+            'TIMEOUT': int(os.environ.get('SYMPTOM_CACHE_TTL', '600')),
+        },
+        'query_embeddings': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'qemb',
+            'TIMEOUT': None,
+        },
+        CHAT_SESSION_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'session',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'doctalk-default',
+        },
+        SYMPTOM_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'doctalk-symptom-check',
+            'TIMEOUT': int(os.environ.get('SYMPTOM_CACHE_TTL', '600')),
+            'OPTIONS': {
+                # LocMemCache evicts least-recently-used entries past this size
+                'MAX_ENTRIES': int(os.environ.get('SYMPTOM_CACHE_MAX_ENTRIES', '2048')),
+            },
+        },
+        CHAT_SESSION_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'api_chat_session_cache',
+            'OPTIONS': {
+                # Past this many sessions a third of them (oldest keys first) are culled
+                'MAX_ENTRIES': int(os.environ.get('CHAT_SESSION_MAX_ENTRIES', '100000')),
+            },
+        },
+    }
+    if os.environ.get('QUERY_EMBEDDING_CACHE_DIR'):
+        # On-disk second level for query embeddings, shared by workers on one host
+        CACHES['query_embeddings'] = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['QUERY_EMBEDDING_CACHE_DIR'],
+            'TIMEOUT': None,
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+
+# In-process LRU size for chat query embeddings; the shared level is used when configured
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get('QUERY_EMBEDDING_CACHE_SIZE', '1024'))
+QUERY_EMBEDDING_CACHE_ALIAS = 'query_embeddings' if 'query_embeddings' in CACHES else None
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -143,6 +220,62 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Symptom checker
+SYMPTOM_BATCH_MAX_CASES = int(os.environ.get('SYMPTOM_BATCH_MAX_CASES', '5000'))
+# Seconds a worker trusts its last read of the catalogue version row before checking again
+CATALOGUE_VERSION_CHECK_INTERVAL = float(os.environ.get('CATALOGUE_VERSION_CHECK_INTERVAL', '2'))
+
+# Chatbot embeddings: 'google' (remote), 'hashing' (local, no network) or 'fake'
+# (hashing with FAKE_EMBEDDING_LATENCY seconds per call, for benchmarks)
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'google')
+GOOGLE_EMBEDDING_MODEL = os.environ.get('GOOGLE_EMBEDDING_MODEL', 'models/embedding-001')
+HASHING_EMBEDDING_DIM = int(os.environ.get('HASHING_EMBEDDING_DIM', '384'))
+FAKE_EMBEDDING_LATENCY = float(os.environ.get('FAKE_EMBEDDING_LATENCY', '0.05'))
+
+# Chatbot LLM: 'google' (Gemini) or 'fake' (canned answers after FAKE_LLM_LATENCY seconds, offline)
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'google')
+FAKE_LLM_LATENCY = float(os.environ.get('FAKE_LLM_LATENCY', '0.5'))
+
+# Semantic cache of chatbot answers for near-duplicate questions (cosine similarity)
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'True') == 'True'
+ANSWER_CACHE_THRESHOLD = float(os.environ.get('ANSWER_CACHE_THRESHOLD', '0.95'))
+ANSWER_CACHE_TTL = int(os.environ.get('ANSWER_CACHE_TTL', '3600'))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', '1000'))
+
+# Answer "symptoms/treatment of <disease>" chat questions from the catalogue without the LLM
+CHAT_FAST_PATH_ENABLED = os.environ.get('CHAT_FAST_PATH_ENABLED', 'True') == 'True'
+
+# RAG context assembly (api/context.py): ~token budget for the retrieved text, and chunks
+# below MIN_RELEVANCE (cosine) or below RELATIVE_CUTOFF x the best chunk's score are dropped
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', '600'))
+CHAT_CONTEXT_MIN_RELEVANCE = float(os.environ.get('CHAT_CONTEXT_MIN_RELEVANCE', '0.15'))
+CHAT_CONTEXT_RELATIVE_CUTOFF = float(os.environ.get('CHAT_CONTEXT_RELATIVE_CUTOFF', '0.85'))
+
+# Chat sessions (api/conversation.py): turns kept verbatim before being summarised, and idle lifetime
+CHAT_SESSION_TURNS = int(os.environ.get('CHAT_SESSION_TURNS', '4'))
+CHAT_SESSION_TTL = int(os.environ.get('CHAT_SESSION_TTL', str(60 * 60 * 24)))
+
+# Scheduler in front of Gemini calls (api/llm_scheduler.py). LLM_RATE_PER_MINUTE=0 disables the rate limiter.
+# All limits are per worker process: with N gunicorn workers (gunicorn.conf.py) up to N x LLM_MAX_CONCURRENCY
+# calls are in flight, so set LLM_RATE_PER_MINUTE to the provider quota divided by N. The concurrency cap
+# only guards against floods; a low one queues chats that an async worker could otherwise overlap.
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '32'))
+LLM_RATE_PER_MINUTE = float(os.environ.get('LLM_RATE_PER_MINUTE', '0'))
+LLM_RATE_BURST = int(os.environ.get('LLM_RATE_BURST', '0')) or None
+LLM_CIRCUIT_FAILURES = int(os.environ.get('LLM_CIRCUIT_FAILURES', '3'))
+LLM_CIRCUIT_COOLDOWN = float(os.environ.get('LLM_CIRCUIT_COOLDOWN', '30'))
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', '30'))
+
+# Build the chatbot in a background thread at startup instead of on the first chat request.
+# 'auto': only under gunicorn / uvicorn / runserver; 'True': in every process; 'False': never.
+CHATBOT_WARMUP = os.environ.get('CHATBOT_WARMUP', 'auto')
+
+# Bearer token required to scrape /api/metrics/ (open when empty)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Seconds between checks for a rebuilt vectorstore/ (picked up without a restart)
+CHATBOT_RELOAD_INTERVAL = float(os.environ.get('CHATBOT_RELOAD_INTERVAL', '30'))
+
 # Custom User Model
 AUTH_USER_MODEL = 'api.User'
 
@@ -0,0 +1,21 @@
+# Gunicorn settings for the ASGI deployment:
+#   gunicorn doctalk.asgi:application -c gunicorn.conf.py
+#
+# Each uvicorn worker runs an event loop, so the async views (chat, chat
+# stream, symptom check) keep many requests in flight while they wait on
+# Gemini or the database. One worker per core is enough; adding workers
+# mostly adds memory (every worker loads its own FAISS index).
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+# Gemini limits in settings.py (LLM_MAX_CONCURRENCY, LLM_RATE_PER_MINUTE) apply per worker:
+# the whole deployment makes up to workers x LLM_MAX_CONCURRENCY concurrent calls, so divide
+# the provider's requests-per-minute quota by `workers` when setting LLM_RATE_PER_MINUTE.
+
+# LLM answers and streamed responses can take a while; don't kill the worker
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
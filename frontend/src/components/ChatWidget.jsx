@@ -8,6 +8,7 @@ const ChatWidget = () => {
         { id: 1, text: "Hello! I'm Dr. AI. How can I help you today?", sender: 'bot' }
     ]);
     const [input, setInput] = useState("");
+    const [sessionId, setSessionId] = useState(null);
 
     const [isLoading, setIsLoading] = useState(false);
 
@@ -20,7 +21,8 @@ const ChatWidget = () => {
         setIsLoading(true);
 
         try {
-            const response = await chatWithBot(input);
+            const response = await chatWithBot(input, sessionId);
+            setSessionId(response.session_id);
             setMessages(prev => [...prev, {
                 id: Date.now() + 1,
                 text: response.response,
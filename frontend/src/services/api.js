@@ -57,9 +57,10 @@ export const updateProfile = async (data) => {
     return api.patch('/profile/', data);
 };
 
-export const chatWithBot = async (message) => {
+export const chatWithBot = async (message, sessionId = null) => {
     try {
-        const response = await api.post('/chat/', { message });
+        // The server keeps the conversation; send back the session_id it returned
+        const response = await api.post('/chat/', sessionId ? { message, session_id: sessionId } : { message });
         return response.data;
     } catch (error) {
         console.error("Error chatting with bot", error);